@@ -0,0 +1,83 @@
+# coding=UTF-8
+# Author:Gentlesprite
+# Software:PyCharm
+# File:bench_get_file_window.py
+"""GetFile在途窗口的基准测试:用注入了往返延迟的模拟会话,比较window=1与GET_FILE_WINDOW时单个文件的吞吐量。
+用法:python benchmarks/bench_get_file_window.py [分块数]
+"""
+import os
+import sys
+import time
+import asyncio
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pyrogram import raw
+from pyrogram.file_id import FileId, FileType
+
+from module import GET_FILE_WINDOW
+from module.client import TelegramRestrictedMediaDownloaderClient, CHUNK_SIZE
+
+PAYLOAD: bytes = b'\0' * CHUNK_SIZE
+BANDWIDTH: float = 40 * 1024 ** 2  # 模拟链路的带宽(字节/秒)。
+
+
+class FakeSession:
+    """每个GetFile请求经过rtt秒的往返延迟后返回一个完整的分块,分块的传输共用bandwidth(字节/秒)的链路。"""
+
+    def __init__(self, rtt: float, bandwidth: float):
+        self.rtt: float = rtt
+        self.bandwidth: float = bandwidth
+        self.link: asyncio.Lock = asyncio.Lock()
+
+    async def invoke(self, query, *args, **kwargs):
+        await asyncio.sleep(self.rtt)
+        async with self.link:
+            await asyncio.sleep(len(PAYLOAD) / self.bandwidth)
+        return raw.types.upload.File(type=raw.types.storage.FilePartial(), mtime=0, bytes=PAYLOAD)
+
+
+async def bench(
+        client: TelegramRestrictedMediaDownloaderClient,
+        rtt: float,
+        window: int,
+        chunk_num: int,
+        bandwidth: float = BANDWIDTH
+) -> float:
+    session = FakeSession(rtt=rtt, bandwidth=bandwidth)
+
+    async def _get_media_session(dc_id: int) -> FakeSession:
+        return session
+
+    client.get_media_session = _get_media_session
+    file_id = FileId(
+        file_type=FileType.DOCUMENT,
+        dc_id=4,
+        media_id=1,
+        access_hash=1,
+        file_reference=b''
+    )
+    size: int = 0
+    start: float = time.perf_counter()
+    async for chunk in client.stream_file(file_id, chunk_num * CHUNK_SIZE, window=window):
+        size += len(chunk)
+    assert size == chunk_num * CHUNK_SIZE
+    return size / (time.perf_counter() - start)
+
+
+async def main() -> None:
+    chunk_num: int = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    client = TelegramRestrictedMediaDownloaderClient(name='bench', api_id=1, api_hash='bench', in_memory=True)
+    print(f'chunks={chunk_num} ({chunk_num}MB), link={BANDWIDTH / 1024 ** 2:.0f}MB/s, GET_FILE_WINDOW={GET_FILE_WINDOW}')
+    for rtt in (0.02, 0.05, 0.1, 0.2, 0.3):
+        serial: float = await bench(client, rtt=rtt, window=1, chunk_num=chunk_num)
+        pipelined: float = await bench(client, rtt=rtt, window=GET_FILE_WINDOW, chunk_num=chunk_num)
+        print(
+            f'rtt={rtt * 1000:>4.0f}ms window=1: {serial / 1024 ** 2:7.1f}MB/s '
+            f'window={GET_FILE_WINDOW}: {pipelined / 1024 ** 2:7.1f}MB/s '
+            f'speedup={pipelined / serial:.1f}x'
+        )
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,69 @@
+# coding=UTF-8
+# Author:Gentlesprite
+# Software:PyCharm
+# File:bench_scheduler.py
+"""下载调度器的基准测试:在50个以上的名额下检测是否超发、是否按先来先服务的顺序分配,以及每次分配的开销。
+用法:python benchmarks/bench_scheduler.py [名额数] [任务数]
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from module.scheduler import DownloadScheduler
+
+
+async def bench(limit: int, job_num: int, cancel_ratio: float = 0.05) -> dict:
+    scheduler = DownloadScheduler(limit=limit)
+    peak: list = [0]
+    order: list = []
+
+    async def _job(index: int) -> None:
+        await scheduler.acquire()
+        try:
+            order.append(index)
+            peak[0] = max(peak[0], scheduler.active)
+            await asyncio.sleep(random.random() * 0.002)
+        finally:
+            scheduler.release()
+
+    start: float = time.perf_counter()
+    tasks: list = [asyncio.create_task(_job(index)) for index in range(job_num)]
+    await asyncio.sleep(0)  # 所有任务按编号顺序排队,前limit个直接获得名额。
+    for task in random.sample(tasks[limit:], int(job_num * cancel_ratio)):
+        task.cancel()  # 取消部分仍在排队的任务。
+    await asyncio.gather(*tasks, return_exceptions=True)
+    elapsed: float = time.perf_counter() - start
+    return {
+        'limit': limit,
+        'jobs': job_num,
+        'admitted': len(order),
+        'cancelled': sum(task.cancelled() for task in tasks),
+        'peak_active': peak[0],
+        'fifo': order == sorted(order),
+        'leaked_slots': scheduler.active,
+        'pending': scheduler.pending,
+        'elapsed': elapsed
+    }
+
+
+def main() -> None:
+    limits: list = [int(sys.argv[1])] if len(sys.argv) > 1 else [50, 100, 200]
+    job_num: int = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    for limit in limits:
+        res: dict = asyncio.run(bench(limit=limit, job_num=job_num))
+        print(
+            f'slots={res["limit"]:>4} jobs={res["jobs"]} admitted={res["admitted"]} cancelled={res["cancelled"]} '
+            f'peak_active={res["peak_active"]} fifo={res["fifo"]} '
+            f'leaked_slots={res["leaked_slots"]} pending={res["pending"]} '
+            f'elapsed={res["elapsed"]:.2f}s ({res["admitted"] / res["elapsed"]:.0f} jobs/s)'
+        )
+        assert res['peak_active'] <= res['limit'] and res['fifo']
+        assert res['leaked_slots'] == 0 and res['pending'] == 0 and res['admitted'] + res['cancelled'] == res['jobs']
+
+
+if __name__ == '__main__':
+    main()
@@ -57,6 +57,23 @@ MAX_FILE_REFERENCE_TIME = 600
 Session.WAIT_TIMEOUT = 100
 Session.START_TIMEOUT = 60
 SLEEP_THRESHOLD = 60
+DOWNLOAD_CONNECTION = 4  # 单个大文件分段下载时的并发连接数。
+GET_FILE_WINDOW = 8  # 单个文件同时在途的GetFile请求数(每个请求1MB),由该文件的所有分段平分,高延迟网络下可适当调大。
+SEGMENT_DOWNLOAD_THRESHOLD = 64 * 1024 * 1024  # 文件大小不小于该值时才启用分段下载。
+RESOLVE_WORKER = 200  # 流水线中同时解析链接的协程数,与get_messages单次最多获取的消息数一致以便合并请求。
+DOWNLOAD_QUEUE_SIZE = 100  # 已解析但还未开始下载的文件数上限,队列满时暂停解析。
+VERIFY_WORKER = 2  # 流水线中同时校验并移动文件的协程数。
+VERIFY_QUEUE_SIZE = 20  # 已下载但还未校验的文件数上限,队列满时下载名额不会被归还。
+ADAPTIVE_INTERVAL = 10  # 自适应并发控制器每隔多少秒根据吞吐量与限流情况调整一次下载名额。
+HOT_DC_NUM = 2  # 同时下载的数据中心数上限,减少在多个数据中心之间来回切换与同时保持的媒体会话。
+SCHEDULE_LOOKAHEAD = 20  # 除占用名额的任务外,额外取出多少个任务排队,供调度器按数据中心挑选。
+MEDIA_GROUP_CACHE_SIZE = 1000  # 缓存已解析的媒体组数量上限,超出时淘汰最早解析的媒体组。
+FORWARD_BATCH_SIZE = 100  # 单次forward_messages最多转发的消息数(服务端上限)。
+RELAY_BUFFER_SIZE = 8  # 转存受保护内容时内存中最多缓存的下载分块数(每块1MB),缓存满时暂停下载。
+METADATA_CACHE_TTL = 5  # 获取消息、频道、媒体组等元数据的结果在该时间(秒)内被相同的请求直接复用。
+PROXY_CHECK_INTERVAL = 30  # 代理池每隔多少秒检测一次所有代理的延迟。
+PROXY_CHECK_TIMEOUT = 5  # 经由代理连接Telegram数据中心超过该时间(秒)视为代理不可用。
+MEDIA_AUTH_CHECK_TIMEOUT = 15  # 使用保存的授权密钥建立媒体会话并完成授权检查超过该时间(秒)时,丢弃该密钥并重新授权。
 AUTHOR = 'Gentlesprite'
 __version__ = '1.6.0'
 __license__ = 'MIT License'
@@ -71,6 +88,11 @@ PLATFORM = platform.system()
 os.makedirs(APPDATA_PATH, exist_ok=True)  # v1.2.6修复初次运行打开报错问题。
 INPUT_HISTORY_PATH = os.path.join(APPDATA_PATH, f'.{SOFTWARE_SHORT_NAME}_HISTORY')
 MAX_RECORD_LENGTH = 1000
+PEER_CACHE_PATH = os.path.join(APPDATA_PATH, f'{SOFTWARE_SHORT_NAME}_PEER.json')
+PEER_CACHE_TTL = 24 * 60 * 60  # 频道缓存的有效期(秒),过期后重新向服务器解析。
+LEDGER_PATH = os.path.join(APPDATA_PATH, f'{SOFTWARE_SHORT_NAME}_LEDGER.db')
+LEDGER_BATCH_SIZE = 500  # 下载记录累计达到该条数时立即批量写入。
+LEDGER_FLUSH_INTERVAL = 1  # 下载记录最长的批量写入间隔(秒)。
 read_input_history(history_path=INPUT_HISTORY_PATH, max_record_len=MAX_RECORD_LENGTH, platform=PLATFORM)
 # 配置日志输出到文件
 LOG_PATH = os.path.join(APPDATA_PATH, f'{SOFTWARE_SHORT_NAME}_LOG.log')
@@ -109,8 +131,24 @@ README = r'''
 # 这里只是介绍每个参数的含义,软件会详细地引导配置参数。
 # 如果是按照软件的提示填,选看。如果是手动打开config.yaml修改配置,请仔细阅读下面内容。
 # 手动填写时请注意冒号是英文冒号,冒号加一个空格。
+accounts: # 额外的下载账号(选填),填写会话名,首次运行时会依次引导登录,会话文件保存在sessions目录。不需要就填null。
+- account_1 # 下载账号需要加入要下载的频道,主账号负责解析链接,下载任务按负载分配给所有账号。
+- account_2
+adaptive: # 同时下载任务数的自动调整范围(选填),按每个账号计算,运行时根据吞吐量与限流情况在该范围内自动增减。不需要就填null。
+  min_download_task: 1 # 下限,不填时为1。支持的参数:所有>0且不大于max_download_task的整数。
+  max_download_task: 10 # 上限,不填时为max_download_task的2倍。支持的参数:所有不小于max_download_task的整数。
 api_hash: xxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx # 申请的api_hash。
 api_id: 'xxxxxxxx' # 申请的api_id。
+bandwidth: # 带宽限制(选填),单位MB/s,填null或0代表不限速。运行时可通过机器人的/bandwidth命令修改。
+  global_limit: null # 所有下载任务共享的总速度上限。
+  task_limit: null # 单个下载任务的速度上限。
+  schedule: # 按时间段生效的总速度上限,优先于global_limit,时间请加引号,支持跨越零点。不需要就填null。
+  - start: '09:00'
+    end: '18:00'
+    limit: 2
+  - start: '23:00'
+    end: '07:00'
+    limit: null
 # bot_token(选填)如果不填,就不能使用机器人功能。可前往https://t.me/BotFather免费申请。
 bot_token: 123456:ABC-DEF1234ghIkl-zyx57W2v1u123ew11
 download_type: # 需要下载的类型。支持的参数:video,photo。
@@ -121,6 +159,12 @@ links: D:\path\where\your\link\files\save\content.txt # 链接地址写法如下
 # 新建txt文本,一个链接为一行,将路径填入即可请不要加引号,在软件运行前就准备好。
 # D:\path\where\your\link\txt\save\content.txt 一个链接一行。
 max_download_task: 5 # 最大的下载任务数,值过高可能会导致网络相关问题。支持的参数:所有>0的整数。
+proxies: # 额外的代理(选填),与proxy中启用的代理组成代理池,定期检测延迟并自动切换不可用或变慢的代理。不需要就填null。
+- scheme: socks5
+  hostname: 127.0.0.1
+  port: 10809
+  username: null
+  password: null
 proxy: # 代理部分,如不使用请全部填null注意冒号后面有空格,否则不生效导致报错。
   enable_proxy: true # 是否开启代理。支持的参数:true,false。
   hostname: 127.0.0.1 # 代理的ip地址。
@@ -0,0 +1,67 @@
+# coding=UTF-8
+# Author:Gentlesprite
+# Software:PyCharm
+# File:account.py
+import time
+from typing import Iterable, List, Union
+
+import pyrogram
+
+
+class AccountPool:
+    """多账号会话池,按负载与健康状况为下载任务分配账号。
+    账号触发限流后在限流结束前不再分配,无法访问某个频道时由调用方排除该账号后换用其他账号重试。
+    """
+
+    def __init__(self, clients: Iterable[pyrogram.Client]):
+        self.clients: List[pyrogram.Client] = []
+        self.__active: dict = {}  # {客户端: 正在下载的任务数}
+        self.__flood_until: dict = {}  # {客户端: 限流结束的时间}
+        for client in clients:
+            self.add(client)
+
+    def add(self, client: pyrogram.Client) -> None:
+        if client not in self.__active:
+            self.clients.append(client)
+            self.__active[client] = 0
+
+    def remove(self, client: pyrogram.Client) -> None:
+        if client in self.__active:
+            self.clients.remove(client)
+            self.__active.pop(client, None)
+            self.__flood_until.pop(client, None)
+
+    @property
+    def transferred_size(self) -> int:
+        """所有账号累计接收的字节数。"""
+        return sum(getattr(client, 'transferred_size', 0) for client in self.clients)
+
+    def acquire(self, exclude: Iterable[pyrogram.Client] = ()) -> Union[pyrogram.Client, None]:
+        """分配一个未被排除、不在限流中且负载最低的账号,没有可用账号时返回None。"""
+        now: float = time.monotonic()
+        candidates: list = [
+            client for client in self.clients
+            if client not in exclude and self.__flood_until.get(client, 0) <= now
+        ]
+        if not candidates:
+            return None
+        client: pyrogram.Client = min(candidates, key=lambda _client: self.__active.get(_client))
+        self.__active[client] += 1
+        return client
+
+    def release(self, client: pyrogram.Client) -> None:
+        if client in self.__active:
+            self.__active[client] = max(self.__active.get(client) - 1, 0)
+
+    def set_flood_wait(self, client: pyrogram.Client, seconds: float) -> None:
+        """记录账号的限流时间,期间不再分配该账号。"""
+        if client in self.__active:
+            self.__flood_until[client] = max(self.__flood_until.get(client, 0), time.monotonic() + seconds)
+
+    def get_wait(self, exclude: Iterable[pyrogram.Client] = ()) -> Union[float, None]:
+        """距离最早有账号可用还需等待的秒数,所有账号都被排除时返回None。"""
+        now: float = time.monotonic()
+        waits: list = [
+            max(self.__flood_until.get(client, 0) - now, 0) for client in self.clients if client not in exclude
+        ]
+        return min(waits) if waits else None
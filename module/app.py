@@ -13,13 +13,15 @@ from typing import Dict, Union
 
 import pyrogram
 
-from module import Session, SLEEP_THRESHOLD
+from module import Session, SLEEP_THRESHOLD, DOWNLOAD_CONNECTION
 from module import console, log
 from module import MAX_FILE_REFERENCE_TIME, SOFTWARE_FULL_NAME
 from module.language import _t
+from module.bot import Bot
 from module.config import Config
 from module.stdio import StatisticalTable, MetaData
 from module.enums import DownloadType, DownloadStatus, KeyWord
+from module.limiter import BandwidthLimiter
 from module.client import TelegramRestrictedMediaDownloaderClient
 from module.path_tool import split_path, validate_title, truncate_filename, get_extension
 
@@ -30,21 +32,31 @@ class Application(Config, StatisticalTable):
         Config.__init__(self)
         StatisticalTable.__init__(self)
         self.client = self.build_client()
+        self.client.limiter = BandwidthLimiter.from_config(self.bandwidth)
+        self.account_clients: list = []  # 额外的下载账号,与主账号共享同一个限速器。
+        for account in dict.fromkeys(self.accounts):
+            if account in (self.client.name, Bot.BOT_NAME):
+                log.warning(f'下载账号的会话名"{account}"与主账号或机器人重复,已忽略。')
+                continue
+            client = self.build_client(name=account)
+            client.limiter = self.client.limiter
+            self.account_clients.append(client)
         self.__get_download_type()
-        self.current_task_num: int = 0
         self.max_retry_count: int = 3
 
-    def build_client(self) -> pyrogram.Client:
-        """用填写的配置文件,构造pyrogram客户端。"""
+    def build_client(self, name: Union[str, None] = None) -> pyrogram.Client:
+        """用填写的配置文件,构造pyrogram客户端,name为None时构造主账号的客户端,否则构造该会话名的下载账号。"""
         os.makedirs(self.work_directory, exist_ok=True)
-        Session.WAIT_TIMEOUT = min(Session.WAIT_TIMEOUT + self.max_download_task ** 2, MAX_FILE_REFERENCE_TIME)
+        if name is None:
+            Session.WAIT_TIMEOUT = min(Session.WAIT_TIMEOUT + self.max_download_task ** 2, MAX_FILE_REFERENCE_TIME)
         return TelegramRestrictedMediaDownloaderClient(
-            name=SOFTWARE_FULL_NAME.replace(' ', ''),
+            name=name or SOFTWARE_FULL_NAME.replace(' ', ''),
             api_id=self.api_id,
             api_hash=self.api_hash,
             proxy=self.enable_proxy,
             workdir=self.work_directory,
-            max_concurrent_transmissions=self.max_download_task,
+            # 每个分段都会占用一个传输名额,按自动调整的上限分配,使同时下载任务数上调后不受传输名额限制。
+            max_concurrent_transmissions=self.max_download_task_limit * DOWNLOAD_CONNECTION,
             sleep_threshold=SLEEP_THRESHOLD,
         )
         # v1.3.7 新增多任务下载功能,无论是否Telegram会员。
@@ -100,6 +112,19 @@ class Application(Config, StatisticalTable):
             'is_document_type_valid': is_document_type_valid
         }
 
+    def get_search_filters(self) -> list:
+        """根据需要下载的类型获取服务端搜索媒体消息时使用的过滤器。"""
+        filters: list = []
+        if DownloadType.VIDEO in self.download_type and DownloadType.PHOTO in self.download_type:
+            filters.append(pyrogram.raw.types.InputMessagesFilterPhotoVideo())
+        elif DownloadType.VIDEO in self.download_type:
+            filters.append(pyrogram.raw.types.InputMessagesFilterVideo())
+        elif DownloadType.PHOTO in self.download_type:
+            filters.append(pyrogram.raw.types.InputMessagesFilterPhotos())
+        if DownloadType.DOCUMENT in self.download_type:  # 文档形式的视频和图片由get_valid_dtype再次过滤。
+            filters.append(pyrogram.raw.types.InputMessagesFilterDocument())
+        return filters
+
     def __get_temp_file_path(
             self, message: pyrogram.types.Message,
             dtype: str
@@ -193,8 +218,6 @@ class Application(Config, StatisticalTable):
                     self.failure_photo.add(file_name)
                 elif download_status == DownloadStatus.SKIP:
                     self.skip_photo.add(file_name)
-                elif download_status == DownloadStatus.DOWNLOADING:
-                    self.current_task_num += 1
             elif download_type == DownloadType.VIDEO:
                 if download_status == DownloadStatus.SUCCESS:
                     self.success_video.add(file_name)
@@ -202,8 +225,6 @@ class Application(Config, StatisticalTable):
                     self.failure_video.add(file_name)
                 elif download_status == DownloadStatus.SKIP:
                     self.skip_video.add(file_name)
-                elif download_status == DownloadStatus.DOWNLOADING:
-                    self.current_task_num += 1
             # v1.2.9 修复失败时重新下载时会抛出RuntimeError的问题。
             if self.failure_video and self.success_video:
                 self.failure_video -= self.success_video  # 直接使用集合的差集操作。
@@ -29,7 +29,8 @@ class Bot:
         BotCommand(BotCommandText.EXIT[0], BotCommandText.EXIT[1]),
         BotCommand(BotCommandText.LISTEN_DOWNLOAD[0], BotCommandText.LISTEN_DOWNLOAD[1].replace('`', '')),
         BotCommand(BotCommandText.LISTEN_FORWARD[0], BotCommandText.LISTEN_FORWARD[1].replace('`', '')),
-        BotCommand(BotCommandText.LISTEN_INFO[0], BotCommandText.LISTEN_INFO[1])
+        BotCommand(BotCommandText.LISTEN_INFO[0], BotCommandText.LISTEN_INFO[1]),
+        BotCommand(BotCommandText.BANDWIDTH[0], BotCommandText.BANDWIDTH[1].replace('`', ''))
     ]
 
     def __init__(self):
@@ -142,10 +143,24 @@ class Bot:
                         message=message
                 ):
                     return None
-                right_link: set = set()
                 invalid_link: set = set()
-                for i in range(start_id, end_id + 1):
-                    right_link.add(f'{link[0]}/{i}')
+                right_link: Union[set, None] = await self.get_media_link(
+                    link=link[0],
+                    start_id=start_id,
+                    end_id=end_id
+                )
+                if right_link is None:  # 无法在服务端过滤时,退回到逐个ID生成链接。
+                    right_link: set = set()
+                    for i in range(start_id, end_id + 1):
+                        right_link.add(f'{link[0]}/{i}')
+                elif not right_link:
+                    await client.send_message(
+                        chat_id=message.from_user.id,
+                        reply_parameters=ReplyParameters(message_id=message.id),
+                        text=f'😵😵😵该范围内没有需要下载的媒体😵😵😵\n`{link[0]}` {start_id}~{end_id}',
+                        link_preview_options=LINK_PREVIEW_OPTIONS
+                    )
+                    return None
             else:
                 right_link: set = set([_ for _ in link if _.startswith('https://t.me/')])
                 invalid_link: set = set([_ for _ in link if not _.startswith('https://t.me/')])
@@ -239,6 +254,7 @@ class Bot:
             f'🕵️ {BotCommandText.with_description(BotCommandText.LISTEN_DOWNLOAD)}\n'
             f'📲 {BotCommandText.with_description(BotCommandText.LISTEN_FORWARD)}\n'
             f'🔍 {BotCommandText.with_description(BotCommandText.LISTEN_INFO)}\n'
+            f'🚦 {BotCommandText.with_description(BotCommandText.BANDWIDTH)}\n'
         )
 
         await client.send_message(
@@ -332,6 +348,37 @@ class Bot:
             return None
         return {'origin_link': args[1], 'target_link': args[2], 'message_range': [start_id, end_id]}
 
+    @staticmethod
+    async def bandwidth(
+            client: pyrogram.Client,
+            message: pyrogram.types.Message
+    ) -> Union[Dict[str, Union[float, None]], None]:
+        """解析/bandwidth命令,不带参数时返回空字典代表仅查看当前限速。
+        只返回明确给出的限速,未给出或填-的限速保持不变。
+        """
+        args: list = message.text.split()
+        if len(args) == 1:
+            return {}
+        meta: dict = {}
+        try:
+            for index, key in enumerate(('global_limit', 'task_limit'), start=1):
+                value: Union[str, None] = safe_index(args, index)
+                if value is None or value == '-':
+                    continue
+                limit: float = float(value)
+                if limit < 0:
+                    raise ValueError('限速不能为负数。')
+                meta[key] = limit or None
+        except Exception as e:
+            await client.send_message(
+                chat_id=message.from_user.id,
+                reply_parameters=ReplyParameters(message_id=message.id),
+                text=f'❌❌❌命令错误❌❌❌\n{e}\n'
+                     f'请使用`/bandwidth 总速度 单任务速度`(单位MB/s,0为不限速,-为保持不变)'
+            )
+            return None
+        return meta
+
     async def exit(
             self,
             client: pyrogram.Client,
@@ -466,6 +513,14 @@ class Bot:
                 return None
         return {'command': command, 'links': links}
 
+    @staticmethod
+    async def get_media_link(
+            link: str,
+            start_id: int,
+            end_id: int
+    ) -> Union[set, None]:
+        return None
+
     @staticmethod
     async def listen_download(
             client: pyrogram.Client,
@@ -638,6 +693,12 @@ class Bot:
                     filters=pyrogram.filters.command(['listen_info']) & pyrogram.filters.user(self.root)
                 )
             )
+            self.bot.add_handler(
+                MessageHandler(
+                    self.bandwidth,
+                    filters=pyrogram.filters.command(['bandwidth']) & pyrogram.filters.user(self.root)
+                )
+            )
             self.bot.add_handler(
                 MessageHandler(
                     self.get_link_from_bot,
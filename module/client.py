@@ -3,20 +3,171 @@
 # Software:PyCharm
 # Time:2025/2/25 1:26
 # File:client.py
+import os
+import math
+import time
+import shutil
+import sqlite3
+import asyncio
+import inspect
+from functools import partial
+from collections import deque
 from datetime import datetime
-from typing import AsyncGenerator, Optional, Union
+from typing import AsyncGenerator, Callable, Iterable, List, Optional, Union
 
 import pyrogram
 from pyrogram import raw, types, utils
+from pyrogram.file_id import FileId, FileType
+from pyrogram.session import Session, Auth
+from pyrogram.errors import AuthBytesInvalid, BadRequest, RPCError
 from pyrogram.errors.exceptions import PhoneNumberInvalid
+from pyrogram.errors.exceptions.flood_420 import FloodWait, FloodPremiumWait
 
-from module import console, SOFTWARE_FULL_NAME, log, __version__
+from module import console, SOFTWARE_FULL_NAME, log, __version__, DOWNLOAD_CONNECTION, RELAY_BUFFER_SIZE, \
+    METADATA_CACHE_TTL, GET_FILE_WINDOW, MEDIA_AUTH_CHECK_TIMEOUT
 from module.enums import KeyWord
 from module.language import _t
+from module.resume import ResumeRecord
+from module.limiter import BandwidthLimiter, TokenBucket
+from module.path_tool import safe_delete, get_extension
+
+CHUNK_SIZE: int = 1024 * 1024  # GetFile单次请求的最大字节数。
+UPLOAD_PART_SIZE: int = 512 * 1024  # SaveFilePart与SaveBigFilePart单个分片的最大字节数。
+BIG_FILE_SIZE: int = 10 * 1024 * 1024  # 超过该大小的文件必须按大文件上传。
+AVAILABLE_MEDIA: tuple = ('audio', 'document', 'photo', 'sticker', 'animation', 'video', 'voice', 'video_note')
+
+
+class MessageBatcher:
+    """把短时间内对同一频道的单条消息请求合并为批量的get_messages请求,再按消息ID将结果分发给各个请求者。"""
+    MAX_BATCH_SIZE: int = 200  # get_messages单次最多获取的消息数。
+
+    def __init__(self, client: pyrogram.Client, delay: float = 0.05):
+        self.client: pyrogram.Client = client
+        self.delay: float = delay  # 收到第一个请求后最多等待多久再发起批量请求。
+        self.__pending: dict = {}  # {chat_id: {message_id: [future, ...]}}
+        self.__timers: dict = {}  # {chat_id: asyncio.TimerHandle}
+        self.__loading: set = set()  # 正在进行的批量请求,持有引用以免任务在完成前被回收。
+
+    async def get(self, chat_id: Union[int, str], message_id: int) -> Optional['types.Message']:
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future = loop.create_future()
+        pending: dict = self.__pending.setdefault(chat_id, {})
+        pending.setdefault(message_id, []).append(future)
+        if len(pending) >= MessageBatcher.MAX_BATCH_SIZE:
+            self.__flush(chat_id)
+        elif chat_id not in self.__timers:
+            self.__timers[chat_id] = loop.call_later(self.delay, self.__flush, chat_id)
+        return await future
+
+    def __flush(self, chat_id: Union[int, str]) -> None:
+        timer = self.__timers.pop(chat_id, None)
+        timer.cancel() if timer else None
+        pending: dict = self.__pending.pop(chat_id, {})
+        if pending:
+            task: asyncio.Task = asyncio.create_task(self.__load(chat_id, pending))
+            self.__loading.add(task)
+            task.add_done_callback(self.__loading.discard)
+
+    async def __load(self, chat_id: Union[int, str], pending: dict) -> None:
+        try:
+            messages: list = await self.client.get_messages(
+                chat_id=chat_id,
+                message_ids=list(pending),
+                replies=0  # 下载时用不到被回复的消息,避免额外的请求。
+            )
+            result: dict = {message.id: message for message in messages if message}
+            for message_id, futures in pending.items():
+                for future in futures:
+                    future.set_result(result.get(message_id)) if not future.done() else None
+        except BaseException as e:
+            for futures in pending.values():
+                for future in futures:
+                    future.set_exception(e) if not future.done() else None
+            if isinstance(e, asyncio.CancelledError):
+                raise
+
+
+class RequestCoalescer:
+    """相同参数的并发请求只发起一次RPC并共享结果,成功的结果在ttl秒内被后续的相同请求直接复用。"""
+    MAX_CACHE_SIZE: int = 10000
+
+    def __init__(self, ttl: float):
+        self.ttl: float = ttl
+        self.__inflight: dict = {}  # {请求: asyncio.Future}
+        self.__cache: dict = {}  # {请求: (过期时间戳, 结果)}
+
+    @staticmethod
+    def key(*args) -> tuple:
+        return tuple(tuple(arg) if isinstance(arg, (list, range, set)) else arg for arg in args)
+
+    async def call(self, key: tuple, func: Callable):
+        cache: Optional[tuple] = self.__cache.get(key)
+        if cache is not None:
+            if cache[0] > time.monotonic():
+                return cache[1]
+            self.__cache.pop(key, None)
+        future: Optional[asyncio.Future] = self.__inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(func())
+            self.__inflight[key] = future
+            future.add_done_callback(partial(self.__done, key))
+        # 某个请求者被取消时不影响其他共享该请求的请求者。
+        return await asyncio.shield(future)
+
+    def __done(self, key: tuple, future: asyncio.Future) -> None:
+        self.__inflight.pop(key, None)
+        if future.cancelled() or future.exception() is not None:
+            return None
+        now: float = time.monotonic()
+        if len(self.__cache) >= RequestCoalescer.MAX_CACHE_SIZE:
+            self.__cache = {k: v for k, v in self.__cache.items() if v[0] > now}
+        self.__cache[key] = (now + self.ttl, future.result())
 
 
 class TelegramRestrictedMediaDownloaderClient(pyrogram.Client):
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.message_batcher: MessageBatcher = MessageBatcher(client=self)
+        self.coalescer: RequestCoalescer = RequestCoalescer(ttl=METADATA_CACHE_TTL)
+        self.transferred_size: int = 0  # 本次运行中所有下载累计接收的字节数。
+        self.limiter: BandwidthLimiter = BandwidthLimiter()
+        self.__warming: dict = {}  # {数据中心ID: 正在预先建立媒体会话的任务}
+        self.__media_session_locks: dict = {}  # {数据中心ID: 建立该数据中心媒体会话的锁}
+
+    async def get_messages(
+            self,
+            chat_id: Optional[Union[int, str]] = None,
+            message_ids: Optional[Union[int, Iterable[int], str]] = None,
+            reply: Optional[bool] = None,
+            pinned: Optional[bool] = None,
+            replies: int = 1
+    ) -> Optional[Union['types.Message', List['types.Message']]]:
+        return await self.coalescer.call(
+            RequestCoalescer.key('get_messages', chat_id, message_ids, reply, pinned, replies),
+            partial(super().get_messages, chat_id, message_ids, reply, pinned, replies)
+        )
+
+    async def get_chat(self, chat_id: Union[int, str], force_full: bool = True) -> 'types.Chat':
+        return await self.coalescer.call(
+            RequestCoalescer.key('get_chat', chat_id, force_full),
+            partial(super().get_chat, chat_id, force_full)
+        )
+
+    async def get_media_group(self, chat_id: Union[int, str], message_id: int) -> List['types.Message']:
+        return await self.coalescer.call(
+            RequestCoalescer.key('get_media_group', chat_id, message_id),
+            partial(super().get_media_group, chat_id, message_id)
+        )
+
+    async def get_message_in_batch(
+            self,
+            chat_id: Union[int, str],
+            message_id: int
+    ) -> Optional['types.Message']:
+        """获取单条消息,同一时间段内对同一频道的请求会被合并为一次批量请求。"""
+        return await self.message_batcher.get(chat_id=chat_id, message_id=message_id)
+
     async def authorize(self) -> pyrogram.types.User:
         console.print(
             f'Pyrogram is free software and comes with ABSOLUTELY NO WARRANTY. Licensed\n'
@@ -144,6 +295,447 @@ class TelegramRestrictedMediaDownloaderClient(pyrogram.Client):
 
         return signed_up
 
+    async def get_media_session(self, dc_id: int) -> Session:
+        """获取指定数据中心的媒体会话,不存在时创建并授权。
+        其他数据中心的授权密钥保存在会话文件中,重启后直接复用,无需再次协商密钥以及导出、导入授权。
+        """
+        session: Optional[Session] = self.media_sessions.get(dc_id)
+        if session:
+            return session
+        # 每个数据中心使用各自的锁,某个数据中心握手较慢时不会拖慢其他数据中心的会话建立。
+        async with self.__media_session_locks.setdefault(dc_id, asyncio.Lock()):
+            session = self.media_sessions.get(dc_id)
+            if session:
+                return session
+            test_mode: bool = await self.storage.test_mode()
+            if dc_id == await self.storage.dc_id():
+                session = Session(self, dc_id, await self.storage.auth_key(), test_mode, is_media=True)
+                await session.start()
+            else:
+                auth_key: Optional[bytes] = self.__load_media_auth(dc_id, test_mode)
+                if auth_key:
+                    session = Session(self, dc_id, auth_key, test_mode, is_media=True)
+                    try:
+                        # 已失效的密钥可能使连接一直重试而不报错,超时后同样丢弃该密钥。
+                        await asyncio.wait_for(self.__check_media_session(session), MEDIA_AUTH_CHECK_TIMEOUT)
+                    except (RPCError, OSError, asyncio.TimeoutError) as e:
+                        # 如多开时的AuthKeyDuplicated,保留该密钥会使该数据中心每次都失败,删除后重新授权。
+                        log.warning(f'数据中心{dc_id}保存的授权密钥不可用,将重新授权,{_t(KeyWord.REASON)}:"{str(e) or "连接超时"}"')
+                        self.__delete_media_auth(dc_id, test_mode)
+                        try:
+                            await session.stop()
+                        except Exception as _:
+                            pass
+                        session = None
+                if session is None:
+                    auth_key = await Auth(self, dc_id, test_mode).create()
+                    session = Session(self, dc_id, auth_key, test_mode, is_media=True)
+                    await session.start()
+                    try:
+                        for _ in range(3):
+                            exported_auth = await self.invoke(raw.functions.auth.ExportAuthorization(dc_id=dc_id))
+                            try:
+                                await session.invoke(
+                                    raw.functions.auth.ImportAuthorization(
+                                        id=exported_auth.id,
+                                        bytes=exported_auth.bytes
+                                    )
+                                )
+                            except AuthBytesInvalid:
+                                continue
+                            else:
+                                break
+                        else:
+                            raise AuthBytesInvalid
+                    except BaseException:
+                        await session.stop()
+                        raise
+                    self.__save_media_auth(dc_id, test_mode, auth_key)
+            self.media_sessions[dc_id] = session
+            return session
+
+    def warm_media_session(self, dc_id: Optional[int]) -> None:
+        """在后台预先建立并授权指定数据中心的媒体会话,使下载开始时无需再等待握手。"""
+        if dc_id is None or dc_id in self.media_sessions or dc_id in self.__warming or not self.is_connected:
+            return None
+
+        async def _warm() -> None:
+            try:
+                await self.get_media_session(dc_id)
+            except Exception as e:
+                log.warning(f'预先连接数据中心{dc_id}失败,{_t(KeyWord.REASON)}:"{e}"')
+            finally:
+                self.__warming.pop(dc_id, None)
+
+        self.__warming[dc_id] = asyncio.create_task(_warm())
+
+    def __media_auth_table(self) -> Optional[sqlite3.Connection]:
+        conn: Optional[sqlite3.Connection] = getattr(self.storage, 'conn', None)
+        if conn is not None:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS media_auth '
+                '(dc_id INTEGER, test_mode INTEGER, auth_key BLOB, PRIMARY KEY (dc_id, test_mode))'
+            )
+        return conn
+
+    def __load_media_auth(self, dc_id: int, test_mode: bool) -> Optional[bytes]:
+        try:
+            conn: Optional[sqlite3.Connection] = self.__media_auth_table()
+            row = conn.execute(
+                'SELECT auth_key FROM media_auth WHERE dc_id = ? AND test_mode = ?', (dc_id, int(test_mode))
+            ).fetchone() if conn else None
+            return row[0] if row else None
+        except Exception as e:
+            log.warning(f'读取数据中心{dc_id}的授权密钥失败,{_t(KeyWord.REASON)}:"{e}"')
+            return None
+
+    def __delete_media_auth(self, dc_id: int, test_mode: bool) -> None:
+        try:
+            conn: Optional[sqlite3.Connection] = self.__media_auth_table()
+            if conn is not None:
+                with conn:
+                    conn.execute('DELETE FROM media_auth WHERE dc_id = ? AND test_mode = ?', (dc_id, int(test_mode)))
+        except Exception as e:
+            log.warning(f'删除数据中心{dc_id}的授权密钥失败,{_t(KeyWord.REASON)}:"{e}"')
+
+    @staticmethod
+    async def __check_media_session(session: Session) -> None:
+        """启动使用已保存的授权密钥的媒体会话并检查授权是否仍然有效,失效时抛出对应的RPCError。"""
+        await session.start()
+        try:
+            await session.invoke(raw.functions.users.GetUsers(id=[raw.types.InputUserSelf()]))
+        except BadRequest:
+            pass  # 已通过授权检查,只是该数据中心不接受此方法。
+
+    def __save_media_auth(self, dc_id: int, test_mode: bool, auth_key: bytes) -> None:
+        try:
+            conn: Optional[sqlite3.Connection] = self.__media_auth_table()
+            if conn is not None:
+                with conn:
+                    conn.execute(
+                        'INSERT OR REPLACE INTO media_auth (dc_id, test_mode, auth_key) VALUES (?, ?, ?)',
+                        (dc_id, int(test_mode), auth_key)
+                    )
+        except Exception as e:
+            log.warning(f'保存数据中心{dc_id}的授权密钥失败,{_t(KeyWord.REASON)}:"{e}"')
+
+    async def stream_file(
+            self,
+            file_id: FileId,
+            file_size: int,
+            limit: int = 0,
+            offset: int = 0,
+            window: int = GET_FILE_WINDOW
+    ) -> AsyncGenerator[bytes, None]:
+        """按顺序产出文件从第offset个分块开始的limit个分块,limit为0代表直到文件末尾。
+        同时保持最多window个GetFile请求在途,单个文件的速度不再受限于每个分块一次往返的延迟。
+        限流不在请求内等待而是直接抛出,由调度器归还名额后重新排队。
+        文件大小未知、被重定向至CDN或是头像文件时,改用get_file逐块下载。
+        """
+        if file_id.file_type == FileType.PHOTO:
+            location = raw.types.InputPhotoFileLocation(
+                id=file_id.media_id,
+                access_hash=file_id.access_hash,
+                file_reference=file_id.file_reference,
+                thumb_size=file_id.thumbnail_size
+            )
+        elif file_id.file_type != FileType.CHAT_PHOTO and file_size:
+            location = raw.types.InputDocumentFileLocation(
+                id=file_id.media_id,
+                access_hash=file_id.access_hash,
+                file_reference=file_id.file_reference,
+                thumb_size=file_id.thumbnail_size
+            )
+        else:
+            location = None
+        # 在锁内建立媒体会话,get_file看到已存在的会话时直接复用,并发的分段与文件不会各自重复创建会话。
+        session: Session = await self.get_media_session(file_id.dc_id)
+        if location is None or not file_size:
+            async for chunk in self.get_file(file_id, file_size, limit, offset):
+                yield chunk
+            return
+        chunk_num: int = math.ceil(file_size / CHUNK_SIZE)
+        end: int = min(offset + limit, chunk_num) if limit else chunk_num
+        async with self.get_file_semaphore:
+            pending: deque = deque()  # [(分块序号, 请求), ...]按偏移顺序排列。
+            next_index: int = offset
+
+            def _request(index: int) -> asyncio.Future:
+                return asyncio.ensure_future(
+                    session.invoke(
+                        raw.functions.upload.GetFile(location=location, offset=index * CHUNK_SIZE, limit=CHUNK_SIZE),
+                        sleep_threshold=0
+                    )
+                )
+
+            try:
+                while next_index < end and len(pending) < max(window, 1):
+                    pending.append((next_index, _request(next_index)))
+                    next_index += 1
+                while pending:
+                    index, request = pending.popleft()
+                    r = await request
+                    if isinstance(r, raw.types.upload.FileCdnRedirect):
+                        break
+                    if next_index < end:
+                        pending.append((next_index, _request(next_index)))
+                        next_index += 1
+                    yield r.bytes
+                    if len(r.bytes) < CHUNK_SIZE:
+                        return
+                else:
+                    return
+            finally:
+                for _, request in pending:
+                    request.cancel()
+                await asyncio.gather(*[request for _, request in pending], return_exceptions=True)
+        async for chunk in self.get_file(file_id, file_size, end - index, index):  # CDN文件的解密与校验交给get_file。
+            yield chunk
+
+    async def download_media_in_segments(
+            self,
+            message: pyrogram.types.Message,
+            file_name: str,
+            connection: int = DOWNLOAD_CONNECTION,
+            progress: Optional[Callable] = None,
+            progress_args: tuple = ()
+    ) -> Optional[str]:
+        """将单个文件按字节范围切分为多个分段并发下载,并原地写入临时文件。
+        每个分段已校验的字节数都会记录在续传记录中,下载失败时保留临时文件,重试或重启后从记录处继续下载。
+        """
+        media = next((getattr(message, kind) for kind in AVAILABLE_MEDIA if getattr(message, kind, None)), None)
+        if media is None:
+            raise ValueError('This message doesn\'t contain any downloadable media')
+        file_id: FileId = FileId.decode(media.file_id)
+        file_size: int = getattr(media, 'file_size', 0) or 0
+        file_path: str = os.path.abspath(file_name)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        record: Optional[ResumeRecord] = None
+        if file_size:
+            record = ResumeRecord.load(
+                file_path=file_path,
+                file_unique_id=media.file_unique_id,
+                file_size=file_size
+            )
+            if record is None:
+                chunk_num: int = math.ceil(file_size / CHUNK_SIZE)
+                step: int = math.ceil(chunk_num / max(min(connection, chunk_num), 1))
+                record = ResumeRecord(
+                    file_path=file_path,
+                    file_unique_id=media.file_unique_id,
+                    file_size=file_size,
+                    segments=[[start, min(start + step, chunk_num), 0] for start in range(0, chunk_num, step)]
+                )
+                with open(record.temp_file_path, 'wb') as f:
+                    f.truncate(file_size)
+                record.save()
+            segments: list = record.segments
+        else:
+            segments: list = [[0, 0, 0]]  # 大小未知时无法分段与续传,limit为0代表下载整个文件。
+            with open(file_path + ResumeRecord.TEMP_EXT, 'wb') as _:
+                pass
+        temp_file_path: str = file_path + ResumeRecord.TEMP_EXT
+        current: list = [sum(done for _, _, done in segments)]
+        bucket: TokenBucket = self.limiter.create_task_bucket()
+
+        async def _download_segment(index: int) -> int:
+            """从上次校验的位置继续下载该分段,返回该分段累计校验的字节数。"""
+            start, end, done = segments[index]
+            if record and done >= min(end * CHUNK_SIZE, file_size) - start * CHUNK_SIZE:
+                return done
+            offset: int = start + done // CHUNK_SIZE
+            with open(temp_file_path, 'r+b') as _f:
+                _f.seek(offset * CHUNK_SIZE)
+                async for chunk in self.stream_file(file_id, file_size, end - offset, offset, window):
+                    _f.write(chunk)
+                    done += len(chunk)
+                    self.transferred_size += len(chunk)
+                    current[0] += len(chunk)
+                    if record:
+                        _f.flush()
+                        record.update(index, done)
+                    if progress:
+                        func = partial(progress, min(current[0], file_size or current[0]), file_size, *progress_args)
+                        await func() if inspect.iscoroutinefunction(progress) else func()
+                    await self.limiter.consume(len(chunk), bucket)
+            return done
+
+        await self.get_media_session(file_id.dc_id)  # 各分段共用同一个媒体会话,避免并发时重复创建。
+        window: int = max(GET_FILE_WINDOW // len(segments), 1)  # 同一文件的所有分段平分在途请求数。
+        tasks: list = [asyncio.create_task(_download_segment(index)) for index in range(len(segments))]
+        try:
+            verified_sizes: list = await asyncio.gather(*tasks)
+        except BaseException as e:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            safe_delete(file_p_d=temp_file_path) if record is None else None
+            if isinstance(e, (asyncio.CancelledError, FloodWait, FloodPremiumWait, TimeoutError, asyncio.TimeoutError)):
+                raise e  # 限流与超时交给调用方,由其归还名额并调整同时下载任务数。
+            log.error(
+                f'{_t(KeyWord.FILE)}:"{file_name}",分段下载失败,'
+                f'{_t(KeyWord.REASON)}:"{e}"'
+            )
+            return None
+        if record:
+            for (start, end, _), verified in zip(segments, verified_sizes):
+                if verified != min(end * CHUNK_SIZE, file_size) - start * CHUNK_SIZE:
+                    # 分段未下载完整,保留临时文件与续传记录以便下次继续。
+                    return None
+            record.remove()
+        shutil.move(temp_file_path, file_path)
+        return file_path
+
+    async def relay_media(
+            self,
+            message: pyrogram.types.Message,
+            chat_id: Union[int, str],
+            buffer_size: int = RELAY_BUFFER_SIZE
+    ) -> None:
+        """边下载边上传,将消息中的媒体直接发送到目标频道。
+        下载的分块放入有界队列后被切分为上传分片,内存中最多缓存buffer_size个分块,全程不写入磁盘。
+        """
+        media = next((getattr(message, kind) for kind in AVAILABLE_MEDIA if getattr(message, kind, None)), None)
+        if media is None:
+            raise ValueError('This message doesn\'t contain any downloadable media')
+        file_size: int = getattr(media, 'file_size', 0) or 0
+        if not file_size:
+            raise ValueError('The size of this media is unknown')
+        file_id: FileId = FileId.decode(media.file_id)
+        mime_type: str = getattr(media, 'mime_type', None) or 'application/octet-stream'
+        is_big: bool = file_size > BIG_FILE_SIZE
+        total_parts: int = math.ceil(file_size / UPLOAD_PART_SIZE)
+        upload_id: int = self.rnd_id()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=max(buffer_size, 1))
+        bucket: TokenBucket = self.limiter.create_task_bucket()
+
+        async def _download() -> None:
+            cancelled: bool = False
+            try:
+                async for chunk in self.stream_file(file_id, file_size):
+                    await self.limiter.consume(len(chunk), bucket)
+                    await queue.put(chunk)
+            except asyncio.CancelledError:
+                cancelled = True  # 上传已出错退出,队列可能已满且无人消费,不能再放入结束标记。
+                raise
+            finally:
+                if not cancelled:
+                    await queue.put(None)
+
+        await self.get_media_session(file_id.dc_id)
+        producer: asyncio.Task = asyncio.create_task(_download())
+        uploaded: int = 0
+        part: int = 0
+        try:
+            while True:
+                chunk: Optional[bytes] = await queue.get()
+                if chunk is None:
+                    break
+                for i in range(0, len(chunk), UPLOAD_PART_SIZE):
+                    data: bytes = chunk[i:i + UPLOAD_PART_SIZE]
+                    if is_big:
+                        query = raw.functions.upload.SaveBigFilePart(
+                            file_id=upload_id,
+                            file_part=part,
+                            file_total_parts=total_parts,
+                            bytes=data
+                        )
+                    else:
+                        query = raw.functions.upload.SaveFilePart(file_id=upload_id, file_part=part, bytes=data)
+                    await self.invoke(query)
+                    part += 1
+                    uploaded += len(data)
+            await producer
+        finally:
+            if not producer.done():
+                producer.cancel()
+                await asyncio.gather(producer, return_exceptions=True)
+        if uploaded != file_size:
+            # 不发送不完整的文件。
+            raise ConnectionError(f'The download ended early ({uploaded}/{file_size} bytes relayed)')
+        file_name: str = getattr(media, 'file_name', None) or \
+            f'{message.id}{get_extension(file_id=media.file_id, mime_type=mime_type)}'
+        if is_big:
+            input_file = raw.types.InputFileBig(id=upload_id, parts=part, name=file_name)
+        else:
+            input_file = raw.types.InputFile(id=upload_id, parts=part, name=file_name, md5_checksum='')
+        if message.photo:
+            input_media = raw.types.InputMediaUploadedPhoto(file=input_file)
+        else:
+            attributes: list = [raw.types.DocumentAttributeFilename(file_name=file_name)]
+            if message.video or message.animation or message.video_note:
+                attributes.append(
+                    raw.types.DocumentAttributeVideo(
+                        duration=getattr(media, 'duration', 0) or 0,
+                        w=getattr(media, 'width', None) or getattr(media, 'length', 0) or 0,
+                        h=getattr(media, 'height', None) or getattr(media, 'length', 0) or 0,
+                        round_message=True if message.video_note else None,
+                        supports_streaming=True if message.video else None
+                    )
+                )
+                attributes.append(raw.types.DocumentAttributeAnimated()) if message.animation else None
+            elif message.audio or message.voice:
+                attributes.append(
+                    raw.types.DocumentAttributeAudio(
+                        duration=getattr(media, 'duration', 0) or 0,
+                        voice=True if message.voice else None,
+                        title=getattr(media, 'title', None),
+                        performer=getattr(media, 'performer', None)
+                    )
+                )
+            input_media = raw.types.InputMediaUploadedDocument(
+                file=input_file,
+                mime_type=mime_type,
+                attributes=attributes
+            )
+        await self.invoke(
+            raw.functions.messages.SendMedia(
+                peer=await self.resolve_peer(chat_id),
+                media=input_media,
+                message='',  # 与转发时一致,不附带原消息的说明文字。
+                random_id=self.rnd_id(),
+                silent=True
+            )
+        )
+
+    async def search_media_message_ids(
+            self,
+            chat_id: Union[int, str],
+            min_id: int,
+            max_id: int,
+            filters: list
+    ) -> list:
+        """在[min_id, max_id]范围内通过服务端的搜索过滤器只列出含有媒体的消息ID,纯文本消息不会被获取。"""
+        peer = await self.resolve_peer(chat_id)
+        message_ids: set = set()
+        for _filter in filters:
+            offset_id: int = 0
+            while True:
+                r = await self.invoke(
+                    raw.functions.messages.Search(
+                        peer=peer,
+                        q='',
+                        filter=_filter,
+                        min_date=0,
+                        max_date=0,
+                        offset_id=offset_id,
+                        add_offset=0,
+                        limit=100,
+                        max_id=max_id + 1,  # min_id与max_id都是开区间。
+                        min_id=max(min_id - 1, 0),
+                        hash=0
+                    ),
+                    sleep_threshold=60
+                )
+                ids: list = [m.id for m in getattr(r, 'messages', []) if isinstance(m, raw.types.Message)]
+                if not ids:
+                    break
+                message_ids.update(ids)
+                offset_id = min(ids)  # 搜索结果按ID从大到小排列。
+                if offset_id <= min_id:
+                    break
+        return sorted(_ for _ in message_ids if min_id <= _ <= max_id)
+
     async def get_chat_history(
             self: pyrogram.Client,
             chat_id: Union[int, str],
@@ -5,6 +5,7 @@
 # File:config.py
 import os
 import sys
+import copy
 import datetime
 from typing import Union
 
@@ -35,8 +36,20 @@ class Config:
         'save_directory': None,  # v1.3.0 将配置文件中save_path的参数名修改为save_directory。
         'max_download_task': None,
         'is_shutdown': None,
-        'download_type': None
+        'download_type': None,
+        'bandwidth': {
+            'global_limit': None,
+            'task_limit': None,
+            'schedule': None
+        },
+        'accounts': None,
+        'proxies': None,
+        'adaptive': {
+            'min_download_task': None,
+            'max_download_task': None
+        }
     }
+    OPTIONAL_KEYS: tuple = ('bandwidth', 'accounts', 'proxies', 'adaptive')  # 可选参数,缺失时直接使用默认值,不触发重新配置。
     TEMP_DIRECTORY: str = os.path.join(os.getcwd(), 'temp')
     BACKUP_DIRECTORY: str = 'ConfigBackup'
     ABSOLUTE_BACKUP_DIRECTORY: str = os.path.join(DIRECTORY_NAME, BACKUP_DIRECTORY)
@@ -71,6 +84,20 @@ class Config:
         self.proxy: dict = self.config.get('proxy', {})
         self.enable_proxy: dict | None = self.proxy if self.proxy.get('enable_proxy') else None
         self.save_directory: str = self.config.get('save_directory')
+        self.proxies: list = ([self.enable_proxy] if self.enable_proxy else []) + (
+            self.config.get('proxies') if isinstance(self.config.get('proxies'), list) else []
+        )  # 代理池,proxy中启用的代理排在首位。
+        self.bandwidth: dict = self.config.get('bandwidth') or {}
+        # 自动调整时每个账号同时下载任务数的上下限,未配置上限时允许增长至max_download_task的2倍。
+        adaptive: dict = self.config.get('adaptive') if isinstance(self.config.get('adaptive'), dict) else {}
+        min_task, max_task = adaptive.get('min_download_task'), adaptive.get('max_download_task')
+        self.min_download_task: int = min(min_task, self.max_download_task) if isinstance(
+            min_task, int) and min_task > 0 else 1
+        self.max_download_task_limit: int = max(max_task, self.max_download_task) if isinstance(
+            max_task, int) and max_task > 0 else self.max_download_task * 2
+        self.accounts: list = [
+            str(account) for account in self.config.get('accounts') if account
+        ] if isinstance(self.config.get('accounts'), list) else []  # 额外的下载账号的会话名。
 
     def get_last_history_record(self) -> None:
         """获取最近一次保存的历史配置文件。"""
@@ -190,6 +217,9 @@ class Config:
                 self.re_config = True  # v1.3.4 修复配置文件不存在时,无法重新生成配置文件的问题。
             with open(self.config_path, 'r', encoding='UTF-8') as f:
                 config: dict = yaml.safe_load(f)  # v1.1.4 加入对每个字段的完整性检测。
+            if isinstance(config, dict):
+                for key in Config.OPTIONAL_KEYS:
+                    config.setdefault(key, copy.deepcopy(Config.TEMPLATE.get(key)))
             compare_config: dict = config.copy()
             config: dict = self.__check_params(config)  # 检查所有字段是否完整,modified代表是否有修改记录(只记录缺少的)
             if config != compare_config or config == Config.TEMPLATE:  # v1.3.4 修复配置文件所有参数都为空时报错问题。
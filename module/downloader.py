@@ -6,8 +6,8 @@
 import os
 import re
 import sys
+import time
 import asyncio
-from functools import partial
 from sqlite3 import OperationalError
 from typing import Tuple, Union
 
@@ -15,14 +15,26 @@ import pyrogram
 from pyrogram.handlers import MessageHandler
 from pyrogram.types.messages_and_media import ReplyParameters
 from pyrogram.types.bots_and_keyboards import InlineKeyboardButton, InlineKeyboardMarkup
+from pyrogram.errors.exceptions.flood_420 import FloodWait, FloodPremiumWait
 from pyrogram.errors.exceptions.not_acceptable_406 import ChannelPrivate, ChatForwardsRestricted
 from pyrogram.errors.exceptions.unauthorized_401 import SessionRevoked, AuthKeyUnregistered, SessionExpired
 from pyrogram.errors.exceptions.bad_request_400 import MsgIdInvalid, UsernameInvalid, ChannelInvalid, \
     BotMethodInvalid, MessageNotModified, UsernameNotOccupied
 
-from module import console, log, utils, LINK_PREVIEW_OPTIONS, SLEEP_THRESHOLD
+from module import console, log, utils, LINK_PREVIEW_OPTIONS, SLEEP_THRESHOLD, DOWNLOAD_CONNECTION, \
+    SEGMENT_DOWNLOAD_THRESHOLD, RESOLVE_WORKER, DOWNLOAD_QUEUE_SIZE, VERIFY_WORKER, VERIFY_QUEUE_SIZE, \
+    MEDIA_GROUP_CACHE_SIZE, PEER_CACHE_PATH, PEER_CACHE_TTL, FORWARD_BATCH_SIZE, LEDGER_PATH, LEDGER_BATCH_SIZE, \
+    LEDGER_FLUSH_INTERVAL, ADAPTIVE_INTERVAL, PROXY_CHECK_INTERVAL, PROXY_CHECK_TIMEOUT, HOT_DC_NUM, SCHEDULE_LOOKAHEAD
 from module.bot import Bot
 from module.task import Task
+from module.peer import PeerCache
+from module.proxy import ProxyPool
+from module.account import AccountPool
+from module.ledger import DownloadLedger
+from module.limiter import BandwidthLimiter
+from module.resume import ResumeRecord
+from module.scheduler import DownloadScheduler, AdaptiveController
+from module.pipeline import Stage, Pipeline
 from module.language import _t
 from module.util import safe_message
 from module.app import Application, MetaData
@@ -30,7 +42,7 @@ from module.util import truncate_display_filename
 from module.stdio import ProgressBar, Base64Image
 from module.enums import LinkType, DownloadStatus, KeyWord, BotCallbackText, BotButton, BotMessage, DownloadType
 from module.path_tool import is_file_duplicate, safe_delete, get_file_size, split_path, compare_file_size, \
-    move_to_save_directory
+    move_to_save_directory, link_to_save_directory, get_dc_id
 
 
 class TelegramRestrictedMediaDownloader(Bot):
@@ -39,14 +51,76 @@ class TelegramRestrictedMediaDownloader(Bot):
         super().__init__()
         MetaData.print_helper()
         self.loop = asyncio.get_event_loop()
-        self.event = asyncio.Event()
-        self.queue = asyncio.Queue()
         self.app = Application()
+        # 主账号与额外的下载账号组成账号池,每个账号最多同时下载max_download_task个文件。
+        self.accounts = AccountPool(clients=[self.app.client, *self.app.account_clients])
+        max_download_task, min_limit, max_limit = self.__get_task_limit()
+        self.scheduler = DownloadScheduler(limit=max_download_task, max_hot_dc=HOT_DC_NUM)
+        # max_download_task作为初始名额,运行时根据吞吐量与限流情况在[min_limit, max_limit]之间自动增减。
+        self.controller = AdaptiveController(
+            scheduler=self.scheduler,
+            get_transferred_size=lambda: self.accounts.transferred_size,
+            min_limit=min_limit,
+            max_limit=max_limit,
+            interval=ADAPTIVE_INTERVAL
+        )
+        # 解析 -> 下载 -> 校验与移动,每个阶段拥有独立的并发数与队列上限。
+        self.resolve_stage = Stage(name='resolve', handler=self.__resolve, worker_num=RESOLVE_WORKER)
+        self.download_stage = Stage(
+            name='download',
+            handler=self.__download,
+            worker_num=max_limit + SCHEDULE_LOOKAHEAD,  # 多出的任务在调度器中排队,供其按数据中心挑选。
+            maxsize=DOWNLOAD_QUEUE_SIZE
+        )
+        self.verify_stage = Stage(
+            name='verify',
+            handler=self.__verify,
+            worker_num=VERIFY_WORKER,
+            maxsize=VERIFY_QUEUE_SIZE
+        )
+        self.pipeline = Pipeline(stages=[self.resolve_stage, self.download_stage, self.verify_stage])
+        # 以(chat_id, media_group_id)为键,同一媒体组的多个链接只请求一次get_media_group,且只由首个链接下载。
+        self.media_group_cache: dict = {}
+        self.media_group_owner: dict = {}
+        self.peer_cache = PeerCache(path=PEER_CACHE_PATH, ttl=PEER_CACHE_TTL)
+        # 配置了额外的代理时,所有客户端由代理池按延迟与负载分配代理并自动切换。
+        self.proxy_pool = ProxyPool(
+            proxies=self.app.proxies,
+            interval=PROXY_CHECK_INTERVAL,
+            timeout=PROXY_CHECK_TIMEOUT
+        ) if self.app.config.get('proxies') else None
+        # 监听转发的路由表,{监听频道chat_id: {监听链接 目标链接: 目标频道chat_id}},每个监听频道只注册一个处理器。
+        self.forward_route: dict = {}
+        self.forward_handler: dict = {}
+        self.ledger = DownloadLedger(
+            path=LEDGER_PATH,
+            batch_size=LEDGER_BATCH_SIZE,
+            flush_interval=LEDGER_FLUSH_INTERVAL
+        )
+        Task.COMPLETE_LINK.update(self.ledger.complete_link)  # 此前运行中已完成的链接同样视为已存在。
+        # 正在下载的文件,{(file_unique_id, 文件大小): {'job': 负责下载的任务, 'waiters': [等待共享结果的任务, ...]}}。
+        self.inflight: dict = {}
         self.is_running: bool = False
         self.running_log: set = set()
         self.running_log.add(self.is_running)
         self.pb = ProgressBar()
 
+    def __get_task_limit(self) -> Tuple[int, int, int]:
+        """返回(初始, 最小, 最大)同时下载任务数,均按每个账号计算后乘以账号数。"""
+        account_num: int = len(self.accounts.clients)
+        return (
+            self.app.max_download_task * account_num,
+            self.app.min_download_task * account_num,
+            self.app.max_download_task_limit * account_num
+        )
+
+    def __apply_task_limit(self) -> None:
+        """账号池变化后按现有的账号数重新设置调度器的名额、自动调整的范围以及下载阶段的协程数。"""
+        max_download_task, min_limit, max_limit = self.__get_task_limit()
+        self.controller.min_limit, self.controller.max_limit = min_limit, max_limit
+        self.scheduler.set_limit(max_download_task)
+        self.download_stage.worker_num = max_limit + SCHEDULE_LOOKAHEAD
+
     async def get_link_from_bot(
             self,
             client: pyrogram.Client,
@@ -77,8 +151,9 @@ class TelegramRestrictedMediaDownloader(Bot):
         links: Union[set, None] = self.__process_links(link=list(right_link))
         if links is None:
             return None
-        for link in links:
-            task: dict = await self.__create_download_task(link=link, retry=None)
+        futures: dict = {link: self.__assign_download_task(link=link) for link in links}
+        for link, future in futures.items():
+            task: dict = await future
             invalid_link.add(link) if task.get('status') == DownloadStatus.FAILURE else self.bot_task_link.add(link)
         right_link -= invalid_link
         await self.safe_edit_message(
@@ -205,6 +280,28 @@ class TelegramRestrictedMediaDownloader(Bot):
                     ]
                 ])
             )
+        elif callback_data.startswith(f'{BotCallbackText.RELAY} '):
+            _, origin_chat_id, target_chat_id, start_id, end_id = callback_data.split()
+            await callback_query.message.edit_reply_markup(
+                InlineKeyboardMarkup([
+                    [
+                        InlineKeyboardButton(
+                            text=BotButton.TASK_ASSIGN,
+                            callback_data=BotCallbackText.NULL
+                        )
+                    ]
+                ])
+            )
+            asyncio.create_task(
+                self.__relay_range(
+                    client=client,
+                    callback_query=callback_query,
+                    origin_chat_id=int(origin_chat_id),
+                    target_chat_id=int(target_chat_id),
+                    start_id=int(start_id),
+                    end_id=int(end_id)
+                )
+            )
         elif callback_data == BotCallbackText.LOOKUP_LISTEN_INFO:
             await self.app.client.send_message(
                 chat_id=callback_query.message.from_user.id,
@@ -223,19 +320,18 @@ class TelegramRestrictedMediaDownloader(Bot):
             elif len(args) == 3:
                 msg: str = '✅已移除'
                 channel: str = f'{args[1]} {args[2]}'
-                self.app.client.remove_handler(self.listen_forward_chat.get(channel))
-                self.listen_forward_chat.pop(channel)
+                self.__remove_forward_route(channel)
             await callback_query.message.edit_text(callback_query.message.text.replace('请选择是否移除', msg))
 
-    async def __get_chat(
-            self, bot_client: pyrogram.Client,
+    async def __get_chat_id(
+            self,
+            bot_client: pyrogram.Client,
             bot_message: pyrogram.types.Message,
             chat_id: Union[int, str],
             error_msg: str
-    ) -> Union[pyrogram.types.Chat, None]:
+    ) -> Union[int, None]:
         try:
-            chat = await self.app.client.get_chat(chat_id)
-            return chat
+            return await self.__resolve_chat_id(chat_id)
         except UsernameNotOccupied:
             await bot_client.send_message(
                 chat_id=bot_message.from_user.id,
@@ -244,6 +340,68 @@ class TelegramRestrictedMediaDownloader(Bot):
             )
             return None
 
+    async def __resolve_chat_id(self, chat_id: Union[int, str]) -> int:
+        """通过频道缓存解析chat_id,缓存命中且当前会话已保存该频道时不会产生网络请求。"""
+        cache_chat_id: Union[int, None] = self.peer_cache.get(chat_id)
+        if cache_chat_id is not None:
+            try:
+                await self.app.client.storage.get_peer_by_id(cache_chat_id)
+                return cache_chat_id
+            except KeyError:
+                pass
+        _chat_id: int = utils.get_peer_id(await self.app.client.resolve_peer(chat_id))
+        self.peer_cache.set(chat_id, _chat_id)
+        return _chat_id
+
+    async def __warm_peer_cache(self, links: set) -> None:
+        """去重后一次性解析链接中出现的所有频道,使后续解析链接时直接命中缓存。"""
+        chats: set = set()
+        for link in links:
+            try:
+                meta: Union[dict, None] = await self.__extract_link_content(link, only_chat_id=True)
+                chats.add(meta.get('chat_id')) if meta else None
+            except Exception as _:
+                continue
+        chats: list = [chat for chat in chats if self.peer_cache.get(chat) is None]
+        if not chats:
+            return None
+        results: list = await asyncio.gather(*[self.__resolve_chat_id(chat) for chat in chats], return_exceptions=True)
+        for chat, result in zip(chats, results):
+            if isinstance(result, Exception):
+                log.warning(f'预先解析频道"{chat}"失败,{_t(KeyWord.REASON)}:"{result}"')
+        console.log(f'已预先解析{len(chats)}个频道。')
+
+    async def bandwidth(
+            self,
+            client: pyrogram.Client,
+            message: pyrogram.types.Message
+    ) -> None:
+        meta: Union[dict, None] = await super().bandwidth(client, message)
+        if meta is None:
+            return None
+        limiter: BandwidthLimiter = self.app.client.limiter
+        if meta:
+            limiter.set_limit(
+                global_limit=meta.get('global_limit', limiter.global_limit),
+                task_limit=meta.get('task_limit', limiter.task_limit),
+                schedule=limiter.schedule
+            )
+            self.app.config['bandwidth'] = limiter.to_config()
+            self.app.save_config(self.app.config)
+            console.log(
+                f'下载限速已修改为:总速度{limiter.global_limit or "不限"}MB/s,单任务{limiter.task_limit or "不限"}MB/s。')
+        current_limit: Union[float, None] = limiter.current_limit
+        await client.send_message(
+            chat_id=message.from_user.id,
+            reply_parameters=ReplyParameters(message_id=message.id),
+            text=f'{"✅限速已修改。" if meta else "🚦当前限速:"}\n'
+                 f'总速度:{f"{limiter.global_limit}MB/s" if limiter.global_limit else "不限速"}\n'
+                 f'单任务:{f"{limiter.task_limit}MB/s" if limiter.task_limit else "不限速"}\n'
+                 f'当前生效:{f"{current_limit}MB/s" if current_limit else "不限速"}'
+                 f'{"(时间段限速)" if current_limit != limiter.global_limit else ""}',
+            link_preview_options=LINK_PREVIEW_OPTIONS
+        )
+
     async def get_forward_link_from_bot(
             self, client: pyrogram.Client,
             message: pyrogram.types.Message
@@ -260,20 +418,20 @@ class TelegramRestrictedMediaDownloader(Bot):
             target_meta: Union[dict, None] = await self.__extract_link_content(target_link, only_chat_id=True)
             if not all([origin_meta, target_meta]):
                 raise Exception('Invalid origin_link or target_link.')
-            origin_chat: Union[pyrogram.types.Chat, None] = await self.__get_chat(
+            origin_chat_id: Union[int, None] = await self.__get_chat_id(
                 bot_client=client, bot_message=message,
                 chat_id=origin_meta.get('chat_id'),
                 error_msg=f'⬇️⬇️⬇️原始频道不存在⬇️⬇️⬇️\n{origin_link}'
             )
-            target_chat: Union[pyrogram.types.Chat, None] = await self.__get_chat(
+            target_chat_id: Union[int, None] = await self.__get_chat_id(
                 bot_client=client, bot_message=message,
                 chat_id=target_meta.get('chat_id'),
                 error_msg=f'⬇️⬇️⬇️目标频道不存在⬇️⬇️⬇️\n{target_link}'
             )
-            if not all([origin_chat, target_chat]):
+            if not all([origin_chat_id, target_chat_id]):
                 return None
             me = await client.get_me()
-            if target_chat.id == me.id:
+            if target_chat_id == me.id:
                 await client.send_message(
                     chat_id=message.from_user.id,
                     text='⚠️⚠️⚠️无法转发到此机器人⚠️⚠️⚠️',
@@ -281,25 +439,17 @@ class TelegramRestrictedMediaDownloader(Bot):
                 )
                 return None
             last_message: Union[pyrogram.types.Message, None] = None
-            async for i in self.app.client.get_chat_history(
-                    chat_id=origin_chat.id,
-                    offset_id=start_id,
-                    max_id=end_id,
-                    reverse=True
+            async for message_ids in self.__iter_forward_batch(
+                    chat_id=origin_chat_id,
+                    start_id=start_id,
+                    end_id=end_id
             ):
-                try:
-                    await self.app.client.forward_messages(
-                        chat_id=target_chat.id,
-                        from_chat_id=origin_chat.id,
-                        message_ids=i.id,
-                        disable_notification=True,
-                        hide_sender_name=True,
-                        hide_captions=True,
-                        protect_content=False
-                    )
-                except ChatForwardsRestricted:
-                    raise ChatForwardsRestricted
-                except Exception as e:
+                failure: dict = await self.__forward_batch(
+                    origin_chat_id=origin_chat_id,
+                    target_chat_id=target_chat_id,
+                    message_ids=message_ids
+                )
+                for message_id, e in failure.items():
                     if not last_message:
                         last_message = await client.send_message(
                             chat_id=message.from_user.id,
@@ -311,9 +461,9 @@ class TelegramRestrictedMediaDownloader(Bot):
                         client=client,
                         message=message,
                         last_message_id=last_message.id,
-                        text=safe_message(f'{last_message.text}\n{origin_link}/{i.id}')
+                        text=safe_message(f'{last_message.text}\n{origin_link}/{message_id}')
                     )
-                    log.warning(f'{_t(KeyWord.LINK)}:"{origin_link}/{i.id}"无效,{_t(KeyWord.REASON)}:{e}')
+                    log.warning(f'{_t(KeyWord.LINK)}:"{origin_link}/{message_id}"无效,{_t(KeyWord.REASON)}:{e}')
             if isinstance(last_message, str):
                 log.warning('消息过长编辑频繁,暂时无法通过机器人显示通知。')
             if not last_message:
@@ -350,6 +500,10 @@ class TelegramRestrictedMediaDownloader(Bot):
                     InlineKeyboardButton(
                         BotButton.CLICK_DOWNLOAD,
                         callback_data=BotCallbackText.DOWNLOAD
+                    ),
+                    InlineKeyboardButton(
+                        BotButton.CLICK_RELAY,
+                        callback_data=f'{BotCallbackText.RELAY} {origin_chat_id} {target_chat_id} {start_id} {end_id}'
                     )
                 ]]))
         except AttributeError as e:  # todo 支持话题频道的转发。
@@ -376,6 +530,129 @@ class TelegramRestrictedMediaDownloader(Bot):
                 text='⬇️⬇️⬇️出错了⬇️⬇️⬇️\n(具体原因请前往终端查看报错信息)'
             )
 
+    async def __iter_forward_batch(
+            self,
+            chat_id: int,
+            start_id: int,
+            end_id: int
+    ):
+        """按顺序遍历范围内的消息并分批返回消息ID,同一媒体组的消息不会被拆到两批中。"""
+        batch: list = []
+        album: list = []
+        media_group_id = None
+        async for i in self.app.client.get_chat_history(
+                chat_id=chat_id,
+                offset_id=start_id,
+                max_id=end_id,
+                reverse=True
+        ):
+            if album and (not i.media_group_id or i.media_group_id != media_group_id):
+                if len(batch) + len(album) > FORWARD_BATCH_SIZE:
+                    yield batch
+                    batch = []
+                batch.extend(album)
+                album = []
+            media_group_id = i.media_group_id
+            album.append(i.id)
+        if len(batch) + len(album) > FORWARD_BATCH_SIZE:
+            yield batch
+            batch = []
+        batch.extend(album)
+        if batch:
+            yield batch
+
+    async def __forward_batch(
+            self,
+            origin_chat_id: int,
+            target_chat_id: int,
+            message_ids: list
+    ) -> dict:
+        """整批转发消息,失败时逐条重试以确定具体失败的消息,返回{消息ID: 异常}。
+        触发限流时等待限流结束后重试,不因限流拆分为逐条转发。
+        """
+        kwargs: dict = {
+            'chat_id': target_chat_id,
+            'from_chat_id': origin_chat_id,
+            'disable_notification': True,
+            'hide_sender_name': True,
+            'hide_captions': True,
+            'protect_content': False
+        }
+
+        async def _forward(_message_ids: Union[int, list]) -> None:
+            while True:
+                try:
+                    await self.app.client.forward_messages(message_ids=_message_ids, **kwargs)
+                    return None
+                except (FloodWait, FloodPremiumWait) as _e:
+                    console.log(f'转发消息时触发限流,将在{_e.value}秒后重试。', style='#FF4689')
+                    await asyncio.sleep(_e.value)
+
+        try:
+            await _forward(message_ids)
+            return {}
+        except ChatForwardsRestricted:
+            raise ChatForwardsRestricted
+        except Exception as e:
+            if len(message_ids) == 1:
+                return {message_ids[0]: e}
+            log.warning(f'批量转发{len(message_ids)}条消息失败,将逐条转发,{_t(KeyWord.REASON)}:"{e}"')
+        failure: dict = {}
+        for message_id in message_ids:
+            try:
+                await _forward(message_id)
+            except ChatForwardsRestricted:
+                raise ChatForwardsRestricted
+            except Exception as e:
+                failure[message_id] = e
+        return failure
+
+    async def __relay_range(
+            self,
+            client: pyrogram.Client,
+            callback_query: pyrogram.types.CallbackQuery,
+            origin_chat_id: int,
+            target_chat_id: int,
+            start_id: int,
+            end_id: int
+    ) -> None:
+        """无法转发受保护的内容时,将范围内的媒体边下载边上传到目标频道。"""
+        relay_num: int = 0
+        failure: list = []
+        try:
+            async for i in self.app.client.get_chat_history(
+                    chat_id=origin_chat_id,
+                    offset_id=start_id,
+                    max_id=end_id,
+                    reverse=True
+            ):
+                if not i.media:
+                    continue
+                try:
+                    await self.app.client.relay_media(message=i, chat_id=target_chat_id)
+                    relay_num += 1
+                    console.log(
+                        f'{_t(KeyWord.LINK)}:"{i.link}" -> "{target_chat_id}",'
+                        f'{_t(KeyWord.STATUS)}:转存成功。'
+                    )
+                except ValueError:
+                    continue  # 不含可下载的媒体(如网页预览、投票)。
+                except Exception as e:
+                    failure.append(i.id)
+                    log.warning(f'{_t(KeyWord.LINK)}:"{i.link}"转存失败,{_t(KeyWord.REASON)}:"{e}"')
+            text: str = f'🌟🌟🌟转存任务已完成🌟🌟🌟\n成功:{relay_num},失败:{len(failure)}'
+            if failure:
+                text += '\n失败的消息ID:' + ','.join(str(_) for _ in failure[:100])
+                text += '...' if len(failure) > 100 else ''
+        except Exception as e:
+            log.exception(f'转存时遇到错误,{_t(KeyWord.REASON)}:"{e}"')
+            text: str = '⬇️⬇️⬇️出错了⬇️⬇️⬇️\n(具体原因请前往终端查看报错信息)'
+        await client.send_message(
+            chat_id=callback_query.from_user.id,
+            reply_parameters=ReplyParameters(message_id=callback_query.message.id),
+            text=text
+        )
+
     async def on_listen(
             self,
             client: pyrogram.Client,
@@ -406,6 +683,34 @@ class TelegramRestrictedMediaDownloader(Bot):
                 await self.cancel_listen(client, message, _link, command)
                 return False
 
+        async def add_forward_route(_listen_link: str, _target_link: str) -> bool:
+            _link: str = f'{_listen_link} {_target_link}'
+            if _link in self.listen_forward_chat:
+                await self.cancel_listen(client, message, _link, command)
+                return False
+            try:
+                # 注册时一次性解析两端的chat_id,收到消息时只需查表。
+                _listen_meta: dict = await self.__extract_link_content(_listen_link, only_chat_id=True)
+                _target_meta: dict = await self.__extract_link_content(_target_link, only_chat_id=True)
+                listen_chat_id: int = await self.__resolve_chat_id(_listen_meta.get('chat_id'))
+                target_chat_id: int = await self.__resolve_chat_id(_target_meta.get('chat_id'))
+                if listen_chat_id not in self.forward_handler:
+                    handler = MessageHandler(self.listen_forward, filters=pyrogram.filters.chat(listen_chat_id))
+                    self.user.add_handler(handler)
+                    self.forward_handler[listen_chat_id] = handler
+                self.forward_route.setdefault(listen_chat_id, {})[_link] = target_chat_id
+                self.listen_forward_chat[_link] = self.forward_handler.get(listen_chat_id)
+                return True
+            except Exception as e:
+                await client.send_message(
+                    chat_id=message.from_user.id,
+                    reply_parameters=ReplyParameters(message_id=message.id),
+                    link_preview_options=LINK_PREVIEW_OPTIONS,
+                    text=f'⚠️⚠️⚠️无法读取⚠️⚠️⚠️\n`{_link}`\n(具体原因请前往终端查看报错信息)'
+                )
+                log.error(f'读取频道"{_link}"时遇到错误,{_t(KeyWord.REASON)}:"{e}"')
+                return False
+
         links: list = meta.get('links')
         command: str = meta.get('command')
         if command == '/listen_download':
@@ -432,7 +737,7 @@ class TelegramRestrictedMediaDownloader(Bot):
                     )
         elif command == '/listen_forward':
             listen_link, target_link = links
-            if await add_listen_chat(f'{listen_link} {target_link}', self.listen_forward_chat, self.listen_forward):
+            if await add_forward_route(listen_link, target_link):
                 await client.send_message(
                     chat_id=message.from_user.id,
                     reply_parameters=ReplyParameters(message_id=message.id),
@@ -445,13 +750,40 @@ class TelegramRestrictedMediaDownloader(Bot):
                         )
                     ]]))
 
+    async def get_media_link(
+            self,
+            link: str,
+            start_id: int,
+            end_id: int
+    ) -> Union[set, None]:
+        """范围下载时只为含有媒体的消息生成链接。"""
+        try:
+            meta: Union[dict, None] = await self.__extract_link_content(link, only_chat_id=True)
+            if meta is None:
+                return None
+            message_ids: list = await self.app.client.search_media_message_ids(
+                chat_id=meta.get('chat_id'),
+                min_id=start_id,
+                max_id=end_id,
+                filters=self.app.get_search_filters()
+            )
+            console.log(
+                f'{_t(KeyWord.LINK)}:"{link}",'
+                f'范围{start_id}~{end_id}中共有{len(message_ids)}条含有媒体的消息。'
+            )
+            return set(f'{link}/{i}' for i in message_ids)
+        except Exception as e:
+            log.warning(f'{_t(KeyWord.LINK)}:"{link}"无法通过服务端过滤媒体消息,{_t(KeyWord.REASON)}:"{e}"')
+            return None
+
     async def listen_download(
             self,
             client: pyrogram.Client,
             message: pyrogram.types
     ):
         try:
-            await self.__create_download_task(link=message.link, single_link=True)
+            # 直接使用收到的消息,无需再次解析链接并获取消息。
+            await self.__assign_download_task(link=message.link, single_link=True, message=message)
         except Exception as e:
             log.exception(f'监听下载出现错误,{_t(KeyWord.REASON)}:{e}')
 
@@ -462,47 +794,57 @@ class TelegramRestrictedMediaDownloader(Bot):
     ):
         try:
             link: str = message.link
-            meta = await self.__extract_link_content(link=link)
-            listen_chat_id = meta.get('chat_id')
-            for m in self.listen_forward_chat:
-                listen_link, target_link = m.split()
-                _listen_link_meta = await self.__extract_link_content(link=listen_link, only_chat_id=True)
-                _target_link_meta = await self.__extract_link_content(link=target_link, only_chat_id=True)
-                _listen_chat_id = _listen_link_meta.get('chat_id')
-                _target_link_id = _target_link_meta.get('chat_id')
-                if listen_chat_id == _listen_chat_id:
-                    try:
-                        await self.app.client.forward_messages(
-                            chat_id=_target_link_id,
-                            from_chat_id=_listen_chat_id,
-                            message_ids=message.id,
-                            disable_notification=True,
-                            hide_sender_name=True,
-                            hide_captions=True,
-                            protect_content=False
-                        )
-                        console.log(
-                            f'{_t(KeyWord.LINK)}:"{link}" -> "{target_link}",'
-                            f'{_t(KeyWord.STATUS)}:转发成功。'
-                        )
-                    except ChatForwardsRestricted:
-                        await client.send_message(
-                            chat_id=message.from_user.id,
-                            text=f'⚠️⚠️⚠️无法转发⚠️⚠️⚠️\n`{listen_chat_id}`存在内容保护限制。',
-                            reply_parameters=ReplyParameters(message_id=message.id),
-                            reply_markup=InlineKeyboardMarkup([[
-                                InlineKeyboardButton(
-                                    BotButton.CLICK_DOWNLOAD,
-                                    callback_data=BotCallbackText.DOWNLOAD
-                                )
-                            ]]))
+            listen_chat_id: int = message.chat.id
+            route: dict = self.forward_route.get(listen_chat_id, {})
+
+            async def forward(_link: str, _target_chat_id: int) -> None:
+                target_link: str = _link.split()[1]
+                try:
+                    await self.app.client.forward_messages(
+                        chat_id=_target_chat_id,
+                        from_chat_id=listen_chat_id,
+                        message_ids=message.id,
+                        disable_notification=True,
+                        hide_sender_name=True,
+                        hide_captions=True,
+                        protect_content=False
+                    )
+                    console.log(
+                        f'{_t(KeyWord.LINK)}:"{link}" -> "{target_link}",'
+                        f'{_t(KeyWord.STATUS)}:转发成功。'
+                    )
+                except ChatForwardsRestricted:
+                    await client.send_message(
+                        chat_id=message.from_user.id,
+                        text=f'⚠️⚠️⚠️无法转发⚠️⚠️⚠️\n`{listen_chat_id}`存在内容保护限制。',
+                        reply_parameters=ReplyParameters(message_id=message.id),
+                        reply_markup=InlineKeyboardMarkup([[
+                            InlineKeyboardButton(
+                                BotButton.CLICK_DOWNLOAD,
+                                callback_data=BotCallbackText.DOWNLOAD
+                            )
+                        ]]))
+                except Exception as e:
+                    log.exception(f'{_t(KeyWord.LINK)}:"{link}" -> "{target_link}"转发失败,{_t(KeyWord.REASON)}:{e}')
+
+            # 同一监听频道的多个目标同时转发。
+            await asyncio.gather(*[forward(_link, target_chat_id) for _link, target_chat_id in list(route.items())])
         except Exception as e:
             log.exception(f'监听转发出现错误,{_t(KeyWord.REASON)}:{e}')
 
+    def __remove_forward_route(self, link: str) -> None:
+        """移除一条监听转发,监听频道没有其他目标时一并移除其处理器。"""
+        self.listen_forward_chat.pop(link, None)
+        for listen_chat_id, route in list(self.forward_route.items()):
+            if route.pop(link, None) is not None and not route:
+                self.forward_route.pop(listen_chat_id)
+                self.app.client.remove_handler(self.forward_handler.pop(listen_chat_id))
+
     async def __extract_link_content(
             self, link: str,
             only_chat_id: bool = False,  # 为True时,只解析传入link的chat_id。
-            single_link: bool = False  # 为True时,将每个链接都视作是单文件。
+            single_link: bool = False,  # 为True时,将每个链接都视作是单文件。
+            refresh: bool = False  # 为True时,不使用缓存的媒体组消息(重试时其中的文件引用可能已过期)。
     ) -> Union[dict, None]:
         origin_link: str = link
         record_type: set = set()
@@ -542,6 +884,7 @@ class TelegramRestrictedMediaDownloader(Bot):
                     chat_id = utils.get_channel_id(int(match.group(1)))
                 except ValueError:
                     chat_id = match.group(1)
+                chat_id = await self.__resolve_chat_id(chat_id)
                 message_id: int = int(match.group(2))
                 comment_message: list = []
                 if LinkType.COMMENT in record_type:
@@ -553,8 +896,8 @@ class TelegramRestrictedMediaDownloader(Bot):
                             if '=' in origin_link and int(origin_link.split('=')[-1]) != comment.id:
                                 continue
                         comment_message.append(comment)
-                message = await self.app.client.get_messages(chat_id=chat_id, message_ids=message_id)
-                is_group, group_message = await self.__is_group(message)
+                message = await self.app.client.get_message_in_batch(chat_id=chat_id, message_id=message_id)
+                is_group, group_message = await self.__is_group(message, refresh=refresh)
                 if single_link:
                     is_group = False
                     group_message: Union[list, None] = None
@@ -596,15 +939,52 @@ class TelegramRestrictedMediaDownloader(Bot):
             else:
                 raise ValueError('Invalid message link.')
 
-    @staticmethod
-    async def __is_group(message) -> Tuple[Union[bool, None], Union[list, None]]:
+    async def __is_group(self, message, refresh: bool = False) -> Tuple[Union[bool, None], Union[list, None]]:
         try:
-            return True, await message.get_media_group()
+            media_group_id = message.media_group_id
+            if not media_group_id:
+                raise ValueError('The message doesn\'t belong to a media group.')
+            key: tuple = (message.chat.id, media_group_id)
+            task: Union[asyncio.Task, None] = self.media_group_cache.get(key)
+            if refresh and task is not None and task.done():
+                # 已完成的请求中的文件引用可能已过期,重试时重新获取,正在进行中的请求仍可复用。
+                self.media_group_cache.pop(key, None)
+                task = None
+            if task is None:
+                # 同一媒体组的其他成员在解析中时复用同一个请求。
+                task = asyncio.ensure_future(message.get_media_group())
+                self.media_group_cache[key] = task
+                while len(self.media_group_cache) > MEDIA_GROUP_CACHE_SIZE:
+                    self.media_group_cache.pop(next(iter(self.media_group_cache)))
+            try:
+                group_message: list = await task
+            except Exception:
+                self.media_group_cache.pop(key, None) if self.media_group_cache.get(key) is task else None
+                raise
+            return True, list(group_message)  # 返回副本,调用方会在列表中追加评论。
         except ValueError:
             return False, None  # v1.0.4 修改单文件无法下载问题。
         except AttributeError:
             return None, None
 
+    def __claim_media_group(self, link: str, message: list) -> str:
+        """登记媒体组由哪个链接负责下载,返回负责该媒体组的链接。"""
+        media_group_id = getattr(message[0], 'media_group_id', None) if message else None
+        if not media_group_id or any(_message.media_group_id != media_group_id for _message in message):
+            return link  # 不是单纯的媒体组(如附带评论),不做合并。
+        key: tuple = (message[0].chat.id, media_group_id)
+        owner: Union[str, None] = self.media_group_owner.get(key)
+        if owner is None or owner in Task.COMPLETE_LINK or Task.LINK_INFO.get(owner, {}).get('member_num') == 0:
+            # 首次出现,原负责链接已完成,或原负责链接未能创建任何下载任务时,由当前链接接手。
+            self.media_group_owner[key] = link
+            if owner is not None:
+                # 原负责链接的等待者改为等待当前链接。
+                Task.LINK_WAITER.setdefault(link, set()).update(Task.LINK_WAITER.pop(owner, set()) - {link})
+            return link
+        if owner != link:
+            Task.LINK_WAITER.setdefault(owner, set()).add(link)
+        return owner
+
     async def __add_task(
             self,
             chat_id: Union[str, int],
@@ -624,7 +1004,6 @@ class TelegramRestrictedMediaDownloader(Bot):
                 else:
                     await self.__add_task(chat_id, link_type, link, _message, retry)
         else:
-            _task = None
             valid_dtype, is_document_type_valid = self.app.get_valid_dtype(message).values()
             if valid_dtype in self.app.download_type and is_document_type_valid:
                 # 如果是匹配到的消息类型就创建任务。
@@ -633,19 +1012,48 @@ class TelegramRestrictedMediaDownloader(Bot):
                     f'{_t(KeyWord.LINK)}:"{link}",'  # 链接。
                     f'{_t(KeyWord.LINK_TYPE)}:{_t(link_type)}。'  # 链接类型。
                 )
-                while self.app.current_task_num >= self.app.max_download_task:  # v1.0.7 增加下载任务数限制。
-                    await self.event.wait()
-                    self.event.clear()
                 file_id, temp_file_path, sever_file_size, file_name, save_directory, format_file_size = \
                     self.app.get_media_meta(
                         message=message,
                         dtype=valid_dtype).values()
                 retry['id'] = file_id
-                if is_file_duplicate(
-                        save_directory=save_directory,
+                file_unique_id: str = getattr(message, valid_dtype).file_unique_id
+                duplicate_path: Union[str, None] = save_directory if is_file_duplicate(
+                    save_directory=save_directory,
+                    sever_file_size=sever_file_size
+                ) else self.ledger.get_duplicate(file_unique_id=file_unique_id, size=sever_file_size)
+                if duplicate_path and not is_file_duplicate(
+                        save_directory=duplicate_path,
                         sever_file_size=sever_file_size
-                ):  # 检测是否存在。
-                    self.__complete_call(
+                ):  # 下载记录中的相同文件已被删除或改动。
+                    duplicate_path = None
+                if duplicate_path and duplicate_path != save_directory:
+                    # 相同文件保存在其他路径时,通过reflink或硬链接在当前路径生成该文件,不产生额外的传输与存储。
+                    result: dict = await asyncio.to_thread(
+                        link_to_save_directory,
+                        source_file_path=duplicate_path,
+                        save_path=save_directory
+                    )
+                    if result.get('e_code') is None:
+                        console.log(
+                            f'{_t(KeyWord.FILE)}:"{save_directory}",'
+                            f'已通过{result.get("method")}链接至"{duplicate_path}"。'
+                        )
+                        duplicate_path = save_directory
+                    else:
+                        log.warning(result.get('e_code'))
+                self.ledger.add_file(
+                    chat_id=message.chat.id,
+                    message_id=message.id,
+                    link=link,
+                    file_unique_id=file_unique_id,
+                    file_path=temp_file_path,
+                    save_path=duplicate_path or save_directory,
+                    size=sever_file_size,
+                    status=DownloadStatus.SUCCESS if duplicate_path else DownloadStatus.DOWNLOADING
+                )
+                if duplicate_path:  # 检测是否存在,其他频道或消息中的相同文件已下载过时同样跳过。
+                    await self.__complete_call(
                         sever_file_size=sever_file_size,
                         temp_file_path=temp_file_path,
                         link=link,
@@ -654,40 +1062,44 @@ class TelegramRestrictedMediaDownloader(Bot):
                         file_id=file_id,
                         format_file_size=format_file_size,
                         task_id=None,
-                        _future=save_directory
+                        _future=duplicate_path
                     )
                 else:
-                    console.log(
-                        f'{_t(KeyWord.FILE)}:"{file_name}",'
-                        f'{_t(KeyWord.SIZE)}:{format_file_size},'
-                        f'{_t(KeyWord.TYPE)}:{_t(self.app.guess_file_type(file_name, DownloadStatus.DOWNLOADING))},'
-                        f'{_t(KeyWord.STATUS)}:{_t(DownloadStatus.DOWNLOADING)}。'
-                    )
-                    task_id = self.pb.progress.add_task(
-                        description='',
-                        filename=truncate_display_filename(file_name),
-                        info=f'0.00B/{format_file_size}',
-                        total=sever_file_size
-                    )
-                    _task = self.loop.create_task(
-                        self.app.client.download_media(
-                            message=message,
-                            progress_args=(self.pb.progress, task_id),
-                            progress=self.pb.download_bar,
-                            file_name=temp_file_path)
-                    )
-                    MetaData.print_current_task_num(self.app.current_task_num)
-                    _task.add_done_callback(
-                        partial(
-                            self.__complete_call, sever_file_size,
-                            temp_file_path,
-                            link,
-                            file_name,
-                            retry_count,
-                            file_id,
-                            format_file_size,
-                            task_id)
-                    )
+                    job: dict = {
+                        'message': message,
+                        'link': link,
+                        'sever_file_size': sever_file_size,
+                        'temp_file_path': temp_file_path,
+                        'file_name': file_name,
+                        'retry_count': retry_count,
+                        'file_id': file_id,
+                        'format_file_size': format_file_size,
+                        'file_unique_id': file_unique_id,
+                        'save_directory': save_directory,
+                        'dc_id': get_dc_id(getattr(message, valid_dtype).file_id)
+                    }
+                    inflight: Union[dict, None] = self.inflight.get((file_unique_id, sever_file_size))
+                    if inflight is None:
+                        self.inflight[(file_unique_id, sever_file_size)] = {'job': job, 'waiters': []}
+                    elif (
+                            retry_count
+                            and inflight.get('job').get('link') == link
+                            and inflight.get('job').get('temp_file_path') == temp_file_path
+                    ):
+                        inflight['job'] = job  # 自身的重试,由新的任务继续负责分发结果。
+                    else:
+                        # 相同的文件正在下载(不是其自身的重试),等待其完成后共享结果,避免同时写入同一个临时文件。
+                        inflight.get('waiters').append(job)
+                        console.log(
+                            f'{_t(KeyWord.FILE)}:"{file_name}",'
+                            f'与正在下载的"{inflight.get("job").get("file_name")}"为同一文件,将在其下载完成后共享结果。'
+                        )
+                        return None
+                    # 在排队期间预先建立各账号到该文件所在数据中心的媒体会话。
+                    for client in self.accounts.clients:
+                        client.warm_media_session(job.get('dc_id'))
+                    # 交给下载阶段,队列已满时在此等待,使链接解析不会远远领先于下载。
+                    await self.download_stage.put(job)
             else:
                 _error = '不支持或被忽略的类型(已取消)。'
                 Task.LINK_INFO.get(link).get('error_msg')['all_member'] = _error.replace('。', '')
@@ -696,9 +1108,230 @@ class TelegramRestrictedMediaDownloader(Bot):
                     f'{_t(KeyWord.LINK)}:"{link}",'  # 链接。
                     f'{_t(KeyWord.LINK_TYPE)}:{_error}'  # 链接类型。
                 )
-            self.queue.put_nowait(_task) if _task else None
 
-    def __check_download_finish(
+    async def __resolve(self, item: dict) -> None:
+        """解析阶段:解析链接并把其中的媒体交给下载阶段。"""
+        future: Union[asyncio.Future, None] = item.get('future')
+        retry: dict = item.get('retry') or {}
+        owner: Union[tuple, None] = next(
+            (
+                (key, inflight.get('job')) for key, inflight in self.inflight.items()
+                if retry.get('count')
+                and inflight.get('job').get('link') == item.get('link')
+                and inflight.get('job').get('file_id') == retry.get('id')
+                and inflight.get('job').get('retry_count') < retry.get('count')
+            ), None
+        )  # 重试的文件正被其他任务等待共享结果时,记录其原先的下载任务。
+        try:
+            res: dict = await self.__create_download_task(
+                link=item.get('link'),
+                retry=item.get('retry'),
+                single_link=item.get('single_link', False),
+                message=item.get('message')
+            )
+        except (FloodWait, FloodPremiumWait) as e:
+            # 解析时触发了超过SLEEP_THRESHOLD的限流,不占用解析协程等待,到期后重新解析,future继续等待结果。
+            console.log(f'{_t(KeyWord.LINK)}:"{item.get("link")}"解析时触发限流,将在{e.value}秒后重新解析。')
+            self.resolve_stage.put_later(item, e.value)
+            return None
+        except BaseException:
+            future.cancel() if future else None  # __create_download_task已处理除限流外的所有异常,只有退出时会走到这里。
+            raise
+        if owner is not None:
+            key, job = owner
+            inflight: Union[dict, None] = self.inflight.get(key)
+            if inflight is not None and inflight.get('job') is job:
+                # 重试未能重新加入下载队列(如消息已被删除),不会再进入校验阶段,按失败分发给等待的任务。
+                await self.__settle_inflight(job=job, success=False)
+        future.set_result(res) if future and not future.done() else None
+
+    async def __download(self, job: dict) -> None:
+        """下载阶段:获取下载名额后下载文件,并在校验阶段接收后才归还名额。"""
+        sever_file_size: int = job.get('sever_file_size')
+        temp_file_path: str = job.get('temp_file_path')
+        file_name: str = job.get('file_name')
+        format_file_size: str = job.get('format_file_size')
+        dc_id: Union[int, None] = job.get('dc_id')
+        await self.scheduler.acquire(dc_id)  # v1.0.7 增加下载任务数限制。
+        exclude: list = job.setdefault('exclude_account', [])  # 无法访问该文件的下载账号。
+        client: Union[pyrogram.Client, None] = self.accounts.acquire(exclude=exclude)
+        try:
+            if client is None:
+                # 所有账号都在限流中,归还名额并等待最早结束限流的账号。
+                self.download_stage.put_later(job, self.accounts.get_wait(exclude=exclude) or 0)
+                return None
+            message: pyrogram.types.Message = job.get('message')
+            if client is not self.app.client:
+                try:
+                    message = await self.__get_account_message(client=client, message=message)
+                except (FloodWait, FloodPremiumWait) as e:
+                    self.accounts.set_flood_wait(client=client, seconds=e.value)
+                    self.download_stage.put_later(job, self.accounts.get_wait(exclude=exclude) or 0)
+                    return None
+                except Exception as e:
+                    log.warning(
+                        f'{_t(KeyWord.FILE)}:"{file_name}",下载账号"{client.name}"无法获取该文件,已换用其他账号,'
+                        f'{_t(KeyWord.REASON)}:"{e}"'
+                    )
+                    exclude.append(client)
+                    self.download_stage.put_later(job, 0)
+                    return None
+            console.log(
+                f'{_t(KeyWord.FILE)}:"{file_name}",'
+                f'{_t(KeyWord.SIZE)}:{format_file_size},'
+                f'{_t(KeyWord.TYPE)}:{_t(self.app.guess_file_type(file_name, DownloadStatus.DOWNLOADING))},'
+                f'{_t(KeyWord.STATUS)}:{_t(DownloadStatus.DOWNLOADING)}。'
+            )
+            task_id = self.pb.progress.add_task(
+                description='',
+                filename=truncate_display_filename(file_name),
+                info=f'0.00B/{format_file_size}',
+                total=sever_file_size
+            )
+            verified_size: Union[int, None] = ResumeRecord.get_verified_size(temp_file_path)
+            if verified_size:
+                console.log(
+                    f'{_t(KeyWord.FILE)}:"{file_name}",'
+                    f'从{MetaData.suitable_units_display(verified_size)}处继续下载。'
+                )
+            MetaData.print_current_task_num(self.scheduler.active)
+            # 记录本次传输的字节数、耗时与首个分块的延迟,作为该数据中心的统计数据。
+            transfer: dict = {'start': time.monotonic(), 'latency': None, 'begin': verified_size or 0}
+            transfer['current'] = transfer.get('begin')
+
+            def _progress(current: int, total: int, *args) -> None:
+                if transfer.get('latency') is None:
+                    transfer['latency'] = time.monotonic() - transfer.get('start')
+                transfer['current'] = current
+                self.pb.download_bar(current, total, *args)
+
+            try:
+                # 所有文件都经由分段下载以支持断点续传,大文件按字节范围分段并发下载。
+                await client.download_media_in_segments(
+                    message=message,
+                    connection=DOWNLOAD_CONNECTION if sever_file_size >= SEGMENT_DOWNLOAD_THRESHOLD else 1,
+                    progress_args=(self.pb.progress, task_id),
+                    progress=_progress,
+                    file_name=temp_file_path
+                )
+                self.scheduler.record(
+                    dc_id=dc_id,
+                    size=transfer.get('current') - transfer.get('begin'),
+                    elapsed=time.monotonic() - transfer.get('start'),
+                    latency=transfer.get('latency') or 0
+                )
+            except PermissionError as e:
+                log.error(
+                    '临时文件无法移动至下载路径,检测到多开软件时,由于在上一个实例中「下载完成」后窗口没有被关闭的行为,请在关闭后重试,'
+                    f'{_t(KeyWord.REASON)}:"{e}"')
+            except (FloodWait, FloodPremiumWait) as e:
+                # 归还名额并在有账号结束限流后重新排队,等待期间名额可供其他任务使用,已下载的部分保留在续传记录中。
+                self.controller.record_congestion()
+                self.accounts.set_flood_wait(client=client, seconds=e.value)
+                wait: float = self.accounts.get_wait(exclude=exclude) or 0
+                self.pb.progress.remove_task(task_id=task_id)
+                console.log(
+                    f'{_t(KeyWord.FILE)}:"{file_name}"触发限流({e.value}秒),已归还下载名额,'
+                    f'将在{wait:.0f}秒后重新排队下载。',
+                    style='#FF4689'
+                )
+                self.download_stage.put_later(job, wait)
+                return None
+            except (TimeoutError, asyncio.TimeoutError) as e:
+                self.controller.record_congestion()  # 请求超时同样视为拥塞。
+                log.warning(f'{_t(KeyWord.FILE)}:"{file_name}"下载出错,{_t(KeyWord.REASON)}:"{e}"')
+            except Exception as e:
+                log.warning(f'{_t(KeyWord.FILE)}:"{file_name}"下载出错,{_t(KeyWord.REASON)}:"{e}"')
+            job['task_id'] = task_id
+            await self.verify_stage.put(job)
+        finally:
+            self.accounts.release(client) if client else None
+            self.scheduler.release(dc_id)  # v1.3.4 修复重试下载被阻塞的问题。
+
+    @staticmethod
+    async def __get_account_message(
+            client: pyrogram.Client,
+            message: pyrogram.types.Message
+    ) -> pyrogram.types.Message:
+        """使用下载账号重新获取消息,文件引用与账号绑定,不能直接使用主账号获取的消息下载。"""
+        chat = message.chat
+        account_message = await client.get_messages(chat_id=chat.username or chat.id, message_ids=message.id)
+        if not account_message or account_message.empty or not account_message.media:
+            raise ValueError('The message is unavailable for this account.')
+        return account_message
+
+    async def __verify(self, job: dict) -> None:
+        """校验阶段:检测文件是否下完并移动至保存目录,未下完时重新放回解析阶段重试。"""
+        res = await self.__complete_call(
+            sever_file_size=job.get('sever_file_size'),
+            temp_file_path=job.get('temp_file_path'),
+            link=job.get('link'),
+            file_name=job.get('file_name'),
+            retry_count=job.get('retry_count'),
+            file_id=job.get('file_id'),
+            format_file_size=job.get('format_file_size'),
+            task_id=job.get('task_id'),
+            _future=None
+        )
+        if res is None and job.get('retry_count') < self.app.max_retry_count:
+            return None  # 已放回解析阶段重试,等待共享结果的任务继续等待。
+        await self.__settle_inflight(job=job, success=res is not None)
+
+    async def __settle_inflight(self, job: dict, success: bool) -> None:
+        """将下载结果分发给等待同一文件的任务,成功时通过链接在各自的保存路径生成文件。"""
+        inflight: Union[dict, None] = self.inflight.pop((job.get('file_unique_id'), job.get('sever_file_size')), None)
+        if inflight is None:
+            return None
+        save_directory: str = job.get('save_directory')
+        for waiter in inflight.get('waiters'):
+            link: str = waiter.get('link')
+            file_name: str = waiter.get('file_name')
+            if not success:
+                _error = '(共享下载的相同文件下载失败)。'
+                self.ledger.set_file_status(
+                    file_path=waiter.get('temp_file_path'),
+                    status=DownloadStatus.FAILURE,
+                    done=0
+                )
+                console.log(
+                    f'{_t(KeyWord.FILE)}:"{file_name}",'
+                    f'{_t(KeyWord.SIZE)}:{waiter.get("format_file_size")},'
+                    f'{_t(KeyWord.TYPE)}:{_t(self.app.guess_file_type(file_name, DownloadStatus.FAILURE))},'
+                    f'{_t(KeyWord.STATUS)}:{_t(DownloadStatus.FAILURE)}'
+                    f'{_error}'
+                )
+                Task.LINK_INFO.get(link).get('error_msg')[file_name] = _error.replace('。', '')
+                self.bot_task_link.discard(link)
+                continue
+            save_path: str = save_directory
+            if waiter.get('save_directory') != save_directory:
+                result: dict = await asyncio.to_thread(
+                    link_to_save_directory,
+                    source_file_path=save_directory,
+                    save_path=waiter.get('save_directory')
+                )
+                if result.get('e_code') is None:
+                    save_path = waiter.get('save_directory')
+                else:
+                    log.warning(result.get('e_code'))
+            self.ledger.set_file_status(
+                file_path=waiter.get('temp_file_path'),
+                status=DownloadStatus.SUCCESS if save_path == waiter.get('save_directory') else DownloadStatus.SKIP,
+                done=waiter.get('sever_file_size')
+            )
+            await self.__complete_call(
+                sever_file_size=waiter.get('sever_file_size'),
+                temp_file_path=waiter.get('temp_file_path'),
+                link=link,
+                file_name=file_name,
+                retry_count=0,
+                file_id=waiter.get('file_id'),
+                format_file_size=waiter.get('format_file_size'),
+                task_id=None,
+                _future=save_path
+            )
+
+    async def __check_download_finish(
             self, sever_file_size: int,
             temp_file_path: str,
             save_directory: str,
@@ -706,16 +1339,22 @@ class TelegramRestrictedMediaDownloader(Bot):
     ) -> bool:
         """检测文件是否下完。"""
         temp_ext: str = '.temp'
-        local_file_size: int = get_file_size(file_path=temp_file_path, temp_ext=temp_ext)
+        verified_size: Union[int, None] = ResumeRecord.get_verified_size(temp_file_path)
+        # 存在续传记录代表临时文件只下载了一部分,此时以已校验的字节数作为本地大小。
+        local_file_size: int = get_file_size(file_path=temp_file_path, temp_ext=temp_ext) \
+            if verified_size is None else verified_size
         format_local_size: str = MetaData.suitable_units_display(local_file_size)
         format_sever_size: str = MetaData.suitable_units_display(sever_file_size)
         _file_path: str = os.path.join(save_directory, split_path(temp_file_path).get('file_name'))
         file_path: str = _file_path[:-len(temp_ext)] if _file_path.endswith(temp_ext) else _file_path
         if compare_file_size(a_size=local_file_size, b_size=sever_file_size):
             if with_move:
-                result: str = move_to_save_directory(
-                    temp_file_path=temp_file_path,
-                    save_directory=save_directory
+                result: str = (
+                    await asyncio.to_thread(  # 跨磁盘移动大文件耗时较长,放到线程中执行以免阻塞事件循环。
+                        move_to_save_directory,
+                        temp_file_path=temp_file_path,
+                        save_directory=save_directory
+                    )
                 ).get('e_code')
                 log.warning(result) if result is not None else None
             console.log(
@@ -732,11 +1371,12 @@ class TelegramRestrictedMediaDownloader(Bot):
             f'{_t(KeyWord.TYPE)}:{_t(self.app.guess_file_type(temp_file_path, DownloadStatus.FAILURE))},'
             f'{_t(KeyWord.STATUS)}:{_t(DownloadStatus.FAILURE)}。'
         )
-        safe_delete(file_p_d=temp_file_path)  # v1.2.9 修复临时文件删除失败的问题。
+        if verified_size is None:
+            safe_delete(file_p_d=temp_file_path)  # v1.2.9 修复临时文件删除失败的问题。
         return False
 
     @Task.on_complete
-    def __complete_call(
+    async def __complete_call(
             self,
             sever_file_size,
             temp_file_path,
@@ -758,27 +1398,28 @@ class TelegramRestrictedMediaDownloader(Bot):
                     f'{_t(KeyWord.STATUS)}:{_t(DownloadStatus.SKIP)}。', style='#e6db74'
                 )
         else:
-            self.app.current_task_num -= 1
-            self.event.set()  # v1.3.4 修复重试下载被阻塞的问题。
-            self.queue.task_done()
-            if self.__check_download_finish(
+            if await self.__check_download_finish(
                     sever_file_size=sever_file_size,
                     temp_file_path=temp_file_path,
                     save_directory=self.app.save_directory,
                     with_move=True
             ):
-                MetaData.print_current_task_num(self.app.current_task_num)
+                self.ledger.set_file_status(file_path=temp_file_path, status=DownloadStatus.SUCCESS, done=sever_file_size)
+                MetaData.print_current_task_num(self.scheduler.active)
             else:
+                self.ledger.set_file_status(
+                    file_path=temp_file_path,
+                    status=DownloadStatus.RETRY if retry_count < self.app.max_retry_count else DownloadStatus.FAILURE,
+                    done=ResumeRecord.get_verified_size(temp_file_path) or 0
+                )
                 if retry_count < self.app.max_retry_count:
                     retry_count += 1
-                    task = self.loop.create_task(
-                        self.__create_download_task(link=link, retry={'id': file_id, 'count': retry_count}))
-                    task.add_done_callback(
-                        partial(
-                            self.__retry_call,
-                            f'{_t(KeyWord.RELOAD)}:"{file_name}",'
-                            f'{_t(KeyWord.RELOAD_TIMES)}:{retry_count}/{self.app.max_retry_count}。'
-                        )
+                    # 解析阶段的队列不设上限,重试时不会与等待校验的下载阶段相互阻塞。
+                    self.resolve_stage.put_nowait({'link': link, 'retry': {'id': file_id, 'count': retry_count}})
+                    console.log(
+                        f'{_t(KeyWord.RELOAD)}:"{file_name}",'
+                        f'{_t(KeyWord.RELOAD_TIMES)}:{retry_count}/{self.app.max_retry_count}。',
+                        style='#FF4689'
                     )
                 else:
                     _error = f'(达到最大重试次数:{self.app.max_retry_count}次)。'
@@ -800,14 +1441,52 @@ class TelegramRestrictedMediaDownloader(Bot):
             self,
             link: str,
             retry: Union[dict, None] = None,
-            single_link: bool = False
+            single_link: bool = False,
+            message: Union[pyrogram.types.Message, None] = None  # 已经获取到的消息,传入时不再解析链接。
     ) -> dict:
         retry = retry if retry else {'id': -1, 'count': 0}
         try:
-            meta: dict = await self.__extract_link_content(link=link, single_link=single_link)
+            if message is not None and retry.get('count') == 0:
+                meta: dict = {
+                    'link_type': LinkType.TOPIC if message.message_thread_id else LinkType.SINGLE,
+                    'chat_id': message.chat.id,
+                    'message': message,
+                    'member_num': 1
+                }
+            else:
+                meta: dict = await self.__extract_link_content(
+                    link=link,
+                    single_link=single_link,
+                    refresh=retry.get('count') > 0
+                )
             link_type, chat_id, message, member_num = meta.values()
+            owner: str = self.__claim_media_group(link=link, message=message) if isinstance(message, list) else link
+            if owner != link:
+                # 与其他链接指向同一个媒体组,成员已由该链接安排下载,不再重复加入下载队列,待该链接完成时一同完成。
+                _error = f'与链接"{owner}"属于同一媒体组(等待其下载完成)。'
+                Task.LINK_INFO.get(link)['link_type'] = link_type
+                Task.LINK_INFO.get(link).get('error_msg')['all_member'] = _error.replace('。', '')
+                console.log(
+                    f'{_t(KeyWord.CHANNEL)}:"{chat_id}",'  # 频道名。
+                    f'{_t(KeyWord.LINK)}:"{link}",'  # 链接。
+                    f'{_t(KeyWord.LINK_TYPE)}:{_error}'  # 链接类型。
+                )
+                return {
+                    'chat_id': chat_id,
+                    'link_type': link_type,
+                    'member_num': 0,
+                    'status': DownloadStatus.SKIP,
+                    'e_code': None
+                }
             Task.LINK_INFO.get(link)['link_type'] = link_type
             Task.LINK_INFO.get(link)['member_num'] = member_num
+            self.ledger.add_link(
+                link=link,
+                chat_id=chat_id,
+                link_type=link_type,
+                member_num=member_num,
+                status=DownloadStatus.DOWNLOADING
+            )
             await self.__add_task(chat_id, link_type, link, message, retry)
             return {
                 'chat_id': chat_id,
@@ -905,6 +1584,8 @@ class TelegramRestrictedMediaDownloader(Bot):
                     'all_member': str(e), 'error_msg': '频道不存在'
                 }
             }
+        except (FloodWait, FloodPremiumWait):
+            raise  # 由解析阶段在限流结束后重新解析。
         except Exception as e:
             log.exception(e)
             return {
@@ -949,44 +1630,80 @@ class TelegramRestrictedMediaDownloader(Bot):
             console.log('没有找到有效链接。', style='#FF4689')
             return None
 
-    @staticmethod
-    def __retry_call(notice, _future):
-        console.log(notice, style='#FF4689')
+    def __assign_download_task(
+            self,
+            link: str,
+            retry: Union[dict, None] = None,
+            single_link: bool = False,
+            message: Union[pyrogram.types.Message, None] = None
+    ) -> asyncio.Future:
+        """将链接放入解析阶段,返回可用于等待该链接解析结果的future。"""
+        future: asyncio.Future = self.loop.create_future()
+        self.resolve_stage.put_nowait(
+            {'link': link, 'retry': retry, 'single_link': single_link, 'message': message, 'future': future}
+        )
+        return future
 
     async def __download_media_from_links(self) -> None:
+        if self.proxy_pool:
+            await self.proxy_pool.check()
+            for client in self.accounts.clients:
+                await self.proxy_pool.assign(client)
+            console.log(
+                f'代理池中可用的代理:{sum(latency is not None for latency in self.proxy_pool.latency)}'
+                f'/{len(self.proxy_pool.proxies)}。'
+            )
         await self.app.client.start()
+        for client in self.app.account_clients:
+            try:
+                await client.start()
+                console.log(f'下载账号"{client.name}"登录成功。')
+            except Exception as e:
+                self.accounts.remove(client)
+                log.error(f'下载账号"{client.name}"登录失败,已从账号池中移除,{_t(KeyWord.REASON)}:"{e}"')
+        self.__apply_task_limit()  # 按登录成功的账号数重新计算名额。
+        self.pipeline.start()
+        self.ledger.start()
+        self.controller.start()
         self.pb.progress.start()  # v1.1.8修复登录输入手机号不显示文本问题。
+        self.proxy_pool.start() if self.proxy_pool else None
         if self.app.bot_token is not None:
-            result = await self.start_bot(
-                self.app.client,
-                pyrogram.Client(
-                    name=self.BOT_NAME,
-                    api_hash=self.app.api_hash,
-                    api_id=self.app.api_id,
-                    bot_token=self.app.bot_token,
-                    workdir=self.app.work_directory,
-                    proxy=self.app.enable_proxy,
-                    sleep_threshold=SLEEP_THRESHOLD
-                )
+            bot_client = pyrogram.Client(
+                name=self.BOT_NAME,
+                api_hash=self.app.api_hash,
+                api_id=self.app.api_id,
+                bot_token=self.app.bot_token,
+                workdir=self.app.work_directory,
+                proxy=self.app.enable_proxy,
+                sleep_threshold=SLEEP_THRESHOLD
             )
+            await self.proxy_pool.assign(bot_client) if self.proxy_pool else None
+            result = await self.start_bot(self.app.client, bot_client)
             console.log(result, style='#B1DB74' if self.is_bot_running else '#FF4689')
         self.is_running = True
         self.running_log.add(self.is_running)
         links: Union[set, None] = self.__process_links(link=self.app.links)
-        # 将初始任务添加到队列中。
-        [await self.loop.create_task(self.__create_download_task(link=link, retry=None)) for link in
-         links] if links else None
-        # 处理队列中的任务与机器人事件。
-        while not self.queue.empty() or self.is_bot_running:
-            result = await self.queue.get()
-            try:
-                await result
-            except PermissionError as e:
-                log.error(
-                    '临时文件无法移动至下载路径,检测到多开软件时,由于在上一个实例中「下载完成」后窗口没有被关闭的行为,请在关闭后重试,'
-                    f'{_t(KeyWord.REASON)}:"{e}"')
+        if links:
+            # 下载记录中已完成的链接直接跳过,无需再次解析。
+            complete_link: set = links & self.ledger.complete_link
+            if complete_link:
+                links -= complete_link
+                console.log(f'下载记录中有{len(complete_link)}个链接已完成,{_t(KeyWord.STATUS)}:{_t(DownloadStatus.SKIP)}。')
+        await self.__warm_peer_cache(links) if links else None
+        # 将初始任务放入解析阶段。
+        [self.__assign_download_task(link=link) for link in links] if links else None
+        # 等待流水线处理完所有任务,机器人运行时持续处理机器人分配的任务。
+        await self.pipeline.join()
+        while self.is_bot_running:
+            await asyncio.sleep(1)
         # 等待所有任务完成。
-        await self.queue.join()
+        await self.pipeline.join()
+        await self.pipeline.stop()
+        await self.controller.stop()
+        await self.proxy_pool.stop() if self.proxy_pool else None
+        await self.ledger.close()
+        for client in self.app.account_clients:
+            await client.stop() if client.is_connected else None
         await self.app.client.stop() if self.app.client.is_connected else None
 
     def run(self) -> None:
@@ -1041,10 +1758,12 @@ class TelegramRestrictedMediaDownloader(Bot):
             log.exception(msg=f'运行出错,{_t(KeyWord.REASON)}:"{e}"')
         finally:
             self.is_running = False
+            self.ledger.flush()  # 异常退出时同样写入尚未提交的下载记录。
             self.pb.progress.stop()
             if not record_error:
                 self.app.print_link_table(link_info=Task.LINK_INFO)
                 self.app.print_count_table(record_dtype=self.app.record_dtype)
+                self.app.print_dc_table(dc_stats=self.scheduler.dc_stats)
                 MetaData.pay()
                 self.app.process_shutdown(60) if len(self.running_log) == 2 else None  # v1.2.8如果并未打开客户端执行任何下载,则不执行关机。
             self.app.ctrl_c()
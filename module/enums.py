@@ -812,6 +812,7 @@ class BotCommandText:
                               '实时监听该链接的最新消息进行下载。\n`/listen_download https://t.me/A https://t.me/B https://t.me/n`')
     LISTEN_FORWARD: tuple = ('listen_forward', '实时监听该链接的最新消息进行转发。\n`/listen_forward 监听频道 转发频道`')
     LISTEN_INFO: tuple = ('listen_info', '查看当前已经创建的监听信息。')
+    BANDWIDTH: tuple = ('bandwidth', '查看或修改下载限速(MB/s,0为不限速,-为保持不变)。\n`/bandwidth 总速度 单任务速度`')
 
     @staticmethod
     def with_description(text: tuple) -> str:
@@ -826,6 +827,7 @@ class BotCallbackText:
     BACK_HELP: str = 'back_help'
     NOTICE: str = 'notice'
     DOWNLOAD: str = 'download'
+    RELAY: str = 'relay'
     REMOVE_LISTEN_DOWNLOAD: str = 'rld'
     REMOVE_LISTEN_FORWARD: str = 'rlf'
     LOOKUP_LISTEN_INFO: str = 'lookup_listen_info'
@@ -854,6 +856,7 @@ class BotButton:
     HELP_PAGE: str = '🛎️帮助页面'
     CLICK_VIEW: str = '🖱点击查看'
     CLICK_DOWNLOAD: str = '🖱点击下载'
+    CLICK_RELAY: str = '🖱点击转存'
     TASK_ASSIGN: str = '✅任务已分配'
     OK: str = '✅确定'
     CANCEL: str = '❌取消'
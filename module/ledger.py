@@ -0,0 +1,172 @@
+# coding=UTF-8
+# Author:Gentlesprite
+# Software:PyCharm
+# File:ledger.py
+import os
+import time
+import sqlite3
+import asyncio
+from typing import Union
+
+from module import log
+from module.language import _t
+from module.enums import KeyWord, DownloadStatus
+
+
+class DownloadLedger:
+    """持久化记录每个链接与文件的下载状态,重启后无需联网即可跳过已完成的链接。
+    写入先缓存在内存中,达到batch_size条或每隔flush_interval秒在同一个事务中批量提交。
+    已下载的文件同时按(file_unique_id, 文件大小)建立索引,用于跳过其他频道或消息中的相同文件。
+    """
+
+    def __init__(self, path: str, batch_size: int, flush_interval: float):
+        self.path: str = path
+        self.batch_size: int = batch_size
+        self.flush_interval: float = flush_interval
+        self.conn: sqlite3.Connection = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(
+            '''
+            CREATE TABLE IF NOT EXISTS link (
+                link TEXT PRIMARY KEY,
+                chat_id TEXT,
+                link_type TEXT,
+                member_num INTEGER,
+                status TEXT,
+                created_at REAL,
+                updated_at REAL
+            );
+            CREATE TABLE IF NOT EXISTS file (
+                chat_id TEXT,
+                message_id INTEGER,
+                link TEXT,
+                file_unique_id TEXT,
+                file_path TEXT,
+                save_path TEXT,
+                size INTEGER,
+                status TEXT,
+                done INTEGER,
+                created_at REAL,
+                updated_at REAL,
+                PRIMARY KEY (chat_id, message_id)
+            );
+            CREATE INDEX IF NOT EXISTS file_path_index ON file (file_path);
+            '''
+        )
+        if 'save_path' not in [row[1] for row in self.conn.execute('PRAGMA table_info(file)')]:
+            self.conn.execute('ALTER TABLE file ADD COLUMN save_path TEXT')
+        self.conn.commit()
+        # 已完成的链接中有文件已被删除或移走时,不再视为已完成,以便重新下载。
+        missing_link: set = set(
+            row[0] for row in self.conn.execute(
+                'SELECT link, save_path FROM file WHERE status = ? AND save_path IS NOT NULL',
+                (DownloadStatus.SUCCESS,)
+            ) if not os.path.isfile(row[1])
+        )
+        self.complete_link: set = set(
+            row[0] for row in self.conn.execute('SELECT link FROM link WHERE status = ?', (DownloadStatus.SUCCESS,))
+        ) - missing_link
+        self.unique_file: dict = {
+            (row[0], row[1]): row[2] for row in self.conn.execute(
+                'SELECT file_unique_id, size, save_path FROM file WHERE status = ? AND save_path IS NOT NULL',
+                (DownloadStatus.SUCCESS,)
+            )
+        }  # {(file_unique_id, 文件大小): 保存路径}
+        self.__downloading: dict = {}  # {临时文件路径: (file_unique_id, 文件大小, 保存路径)}
+        self.__pending: list = []  # [(sql, params), ...]
+        self.__flusher: Union[asyncio.Task, None] = None
+
+    def add_link(
+            self,
+            link: str,
+            chat_id: Union[int, str, None],
+            link_type: Union[str, None],
+            member_num: int,
+            status: str
+    ) -> None:
+        now: float = time.time()
+        self.__write(
+            'INSERT INTO link (link, chat_id, link_type, member_num, status, created_at, updated_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?) '
+            'ON CONFLICT(link) DO UPDATE SET chat_id = excluded.chat_id, link_type = excluded.link_type, '
+            'member_num = excluded.member_num, status = excluded.status, updated_at = excluded.updated_at',
+            (link, None if chat_id is None else str(chat_id), link_type, member_num, status, now, now)
+        )
+
+    def set_link_status(self, link: str, status: str) -> None:
+        self.complete_link.add(link) if status == DownloadStatus.SUCCESS else self.complete_link.discard(link)
+        self.__write('UPDATE link SET status = ?, updated_at = ? WHERE link = ?', (status, time.time(), link))
+
+    def add_file(
+            self,
+            chat_id: Union[int, str],
+            message_id: int,
+            link: str,
+            file_unique_id: str,
+            file_path: str,
+            save_path: str,
+            size: int,
+            status: str
+    ) -> None:
+        now: float = time.time()
+        if status == DownloadStatus.SUCCESS:
+            self.unique_file[(file_unique_id, size)] = save_path
+        else:
+            self.__downloading[file_path] = (file_unique_id, size, save_path)
+        self.__write(
+            'INSERT INTO file (chat_id, message_id, link, file_unique_id, file_path, save_path, size, status, done, '
+            'created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0, ?, ?) '
+            'ON CONFLICT(chat_id, message_id) DO UPDATE SET link = excluded.link, '
+            'file_unique_id = excluded.file_unique_id, file_path = excluded.file_path, '
+            'save_path = excluded.save_path, size = excluded.size, '
+            'status = excluded.status, updated_at = excluded.updated_at',
+            (str(chat_id), message_id, link, file_unique_id, file_path, save_path, size, status, now, now)
+        )
+
+    def set_file_status(self, file_path: str, status: str, done: int) -> None:
+        if status == DownloadStatus.SUCCESS and file_path in self.__downloading:
+            file_unique_id, size, save_path = self.__downloading.pop(file_path)
+            self.unique_file[(file_unique_id, size)] = save_path
+        self.__write(
+            'UPDATE file SET status = ?, done = ?, updated_at = ? WHERE file_path = ?',
+            (status, done, time.time(), file_path)
+        )
+
+    def get_duplicate(self, file_unique_id: str, size: int) -> Union[str, None]:
+        """返回已下载的相同文件的保存路径,没有时返回None。"""
+        return self.unique_file.get((file_unique_id, size))
+
+    def start(self) -> None:
+        """启动定时提交的协程,保证少量写入也能在flush_interval秒内落盘。"""
+        if self.__flusher is None:
+            self.__flusher = asyncio.create_task(self.__flush_periodically())
+
+    async def close(self) -> None:
+        if self.__flusher is not None:
+            self.__flusher.cancel()
+            await asyncio.gather(self.__flusher, return_exceptions=True)
+            self.__flusher = None
+        self.flush()
+
+    def flush(self) -> None:
+        if not self.__pending:
+            return None
+        pending: list = self.__pending
+        self.__pending = []
+        try:
+            with self.conn:
+                for sql, params in pending:
+                    self.conn.execute(sql, params)
+        except Exception as e:
+            log.error(f'写入下载记录"{self.path}"失败,{_t(KeyWord.REASON)}:"{e}"')
+
+    def __write(self, sql: str, params: tuple) -> None:
+        self.__pending.append((sql, params))
+        if len(self.__pending) >= self.batch_size:
+            self.flush()
+
+    async def __flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            self.flush()
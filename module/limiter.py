@@ -0,0 +1,143 @@
+# coding=UTF-8
+# Author:Gentlesprite
+# Software:PyCharm
+# File:limiter.py
+import time
+import asyncio
+import datetime
+from typing import Union
+
+from module import log
+from module.language import _t
+from module.enums import KeyWord
+
+MB: int = 1024 * 1024
+
+
+class TokenBucket:
+    """令牌桶限速器,rate为None时不限速。
+    允许令牌数为负(预支),因此单次消耗大于桶容量的分块也能通过,后续请求会等待相应的时间。
+    """
+
+    def __init__(self, rate: Union[float, None]):
+        self.rate: Union[float, None] = rate  # 字节/秒。
+        self.tokens: float = rate or 0
+        self.timestamp: float = time.monotonic()
+
+    def set_rate(self, rate: Union[float, None]) -> None:
+        self.__refill()
+        self.rate = rate
+        self.tokens = min(self.tokens, rate or 0)
+
+    async def consume(self, size: int) -> None:
+        if not self.rate:
+            return None
+        self.__refill()
+        self.tokens -= size
+        if self.tokens < 0:
+            await asyncio.sleep(-self.tokens / self.rate)
+
+    def __refill(self) -> None:
+        now: float = time.monotonic()
+        if self.rate:
+            self.tokens = min(self.rate, self.tokens + (now - self.timestamp) * self.rate)  # 最多积攒1秒的令牌。
+        self.timestamp = now
+
+
+class BandwidthLimiter:
+    """在下载分块层面限制带宽,支持全局限速、单任务限速以及按时间段生效的全局限速。
+    速度的单位均为MB/s,None或0表示不限速。
+    schedule: [{'start': '01:00', 'end': '07:00', 'limit': None}, ...],当前时间处于某个时间段时以该时间段的limit作为全局限速。
+    """
+
+    def __init__(
+            self,
+            global_limit: Union[float, None] = None,
+            task_limit: Union[float, None] = None,
+            schedule: Union[list, None] = None
+    ):
+        self.global_limit: Union[float, None] = None
+        self.task_limit: Union[float, None] = None
+        self.schedule: list = []
+        self.bucket: TokenBucket = TokenBucket(rate=None)
+        self.set_limit(global_limit=global_limit, task_limit=task_limit, schedule=schedule)
+
+    @staticmethod
+    def from_config(config: Union[dict, None]) -> 'BandwidthLimiter':
+        config: dict = config if isinstance(config, dict) else {}
+        return BandwidthLimiter(
+            global_limit=config.get('global_limit'),
+            task_limit=config.get('task_limit'),
+            schedule=config.get('schedule')
+        )
+
+    def to_config(self) -> dict:
+        return {'global_limit': self.global_limit, 'task_limit': self.task_limit, 'schedule': self.schedule or None}
+
+    def set_limit(
+            self,
+            global_limit: Union[float, None] = None,
+            task_limit: Union[float, None] = None,
+            schedule: Union[list, None] = None
+    ) -> None:
+        self.global_limit = BandwidthLimiter.__to_limit(global_limit)
+        self.task_limit = BandwidthLimiter.__to_limit(task_limit)
+        self.schedule = []
+        for profile in schedule or []:
+            try:
+                self.schedule.append(
+                    {
+                        'start': BandwidthLimiter.__to_time(profile.get('start')),
+                        'end': BandwidthLimiter.__to_time(profile.get('end')),
+                        'limit': BandwidthLimiter.__to_limit(profile.get('limit'))
+                    }
+                )
+            except Exception as e:
+                log.warning(f'忽略无效的限速时间段"{profile}",{_t(KeyWord.REASON)}:"{e}"')
+        self.bucket.set_rate(self.rate)
+
+    @property
+    def current_limit(self) -> Union[float, None]:
+        """当前时间生效的全局限速(MB/s)。"""
+        now: str = datetime.datetime.now().strftime('%H:%M')
+        for profile in self.schedule:
+            start, end = profile.get('start'), profile.get('end')
+            if (start <= now < end) if start <= end else (now >= start or now < end):  # 支持跨越零点的时间段。
+                return profile.get('limit')
+        return self.global_limit
+
+    @property
+    def rate(self) -> Union[float, None]:
+        limit: Union[float, None] = self.current_limit
+        return limit * MB if limit else None
+
+    @property
+    def task_rate(self) -> Union[float, None]:
+        return self.task_limit * MB if self.task_limit else None
+
+    def create_task_bucket(self) -> TokenBucket:
+        """为单个下载任务创建令牌桶,同一文件的所有分段共享该令牌桶。"""
+        return TokenBucket(rate=self.task_rate)
+
+    async def consume(self, size: int, task_bucket: Union[TokenBucket, None] = None) -> None:
+        rate: Union[float, None] = self.rate
+        if rate != self.bucket.rate:  # 进入或离开限速时间段。
+            self.bucket.set_rate(rate)
+        await self.bucket.consume(size)
+        if task_bucket:
+            if task_bucket.rate != self.task_rate:  # 单任务限速已修改,正在下载的任务同样立即生效。
+                task_bucket.set_rate(self.task_rate)
+            await task_bucket.consume(size)
+
+    @staticmethod
+    def __to_limit(limit) -> Union[float, None]:
+        try:
+            return float(limit) if limit and float(limit) > 0 else None
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def __to_time(value) -> str:
+        if isinstance(value, int):  # yaml会将不带引号的01:00解析为六十进制整数(分钟)。
+            value = f'{value // 60:02d}:{value % 60:02d}'
+        return datetime.datetime.strptime(str(value).strip(), '%H:%M').strftime('%H:%M')
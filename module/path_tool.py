@@ -131,6 +131,52 @@ def move_to_save_directory(temp_file_path: str, save_directory: str) -> dict:
         return {'e_code': f'意外的错误,原因:"{e}"'}
 
 
+def link_to_save_directory(source_file_path: str, save_path: str) -> dict:
+    """为已存在的相同文件在指定路径创建引用,尽量不复制文件内容。
+    优先使用reflink(写时复制,两份文件互不影响),文件系统不支持时使用硬链接,
+    跨磁盘或文件系统不支持硬链接(如FAT、exFAT)时复制文件,保证指定路径上总有该文件。
+    """
+    try:
+        os.makedirs(os.path.dirname(save_path) or '.', exist_ok=True)
+        if __reflink(source_file_path, save_path):
+            return {'e_code': None, 'method': 'reflink'}
+        try:
+            os.link(source_file_path, save_path)
+            return {'e_code': None, 'method': 'hardlink'}
+        except FileExistsError:
+            raise
+        except OSError:
+            pass
+        try:
+            shutil.copy2(source_file_path, save_path)
+        except BaseException:
+            safe_delete(file_p_d=save_path)  # 删除复制了一部分的文件。
+            raise
+        return {'e_code': None, 'method': 'copy'}
+    except FileExistsError as e:
+        return {'e_code': f'"{save_path}"已存在,不能重复保存,原因:"{e}"', 'method': None}
+    except Exception as e:
+        return {'e_code': f'无法为"{source_file_path}"创建链接,原因:"{e}"', 'method': None}
+
+
+def __reflink(source_file_path: str, save_path: str) -> bool:
+    """通过FICLONE在支持的文件系统(如Btrfs、XFS)上创建reflink。"""
+    try:
+        import fcntl
+    except ImportError:
+        return False  # Windows不支持。
+    ficlone: int = 0x40049409
+    if os.path.exists(save_path):
+        raise FileExistsError(save_path)
+    try:
+        with open(source_file_path, 'rb') as src, open(save_path, 'wb') as dst:
+            fcntl.ioctl(dst.fileno(), ficlone, src.fileno())
+        return True
+    except OSError:
+        safe_delete(file_p_d=save_path)
+        return False
+
+
 def get_extension(file_id: str, mime_type: str, dot: bool = True) -> str:
     """获取文件的扩展名。
     更多扩展名见: https://www.iana.org/assignments/media-types/media-types.xhtml
@@ -176,8 +222,8 @@ def __guess_extension(mime_type: str) -> Optional[str]:
     return extension[1:] if extension and extension.startswith('.') else extension
 
 
-def __get_file_type(file_id: str) -> FileType:
-    """获取文件类型。"""
+def __unpack_file_id(file_id: str) -> tuple:
+    """解析文件ID的头部,返回(文件类型, 数据中心ID)。"""
     decoded = rle_decode(b64_decode(file_id))
 
     # File id versioning. Major versions lower than 4 don't have a minor version
@@ -188,7 +234,20 @@ def __get_file_type(file_id: str) -> FileType:
     else:
         buffer = BytesIO(decoded[:-2])
 
-    file_type, _ = struct.unpack('<ii', buffer.read(8))
+    return struct.unpack('<ii', buffer.read(8))
+
+
+def get_dc_id(file_id: str) -> Optional[int]:
+    """获取文件所在的数据中心ID,文件ID无效时返回None。"""
+    try:
+        return __unpack_file_id(file_id)[1]
+    except Exception as _:
+        return None
+
+
+def __get_file_type(file_id: str) -> FileType:
+    """获取文件类型。"""
+    file_type, _ = __unpack_file_id(file_id)
 
     file_type &= ~WEB_LOCATION_FLAG
     file_type &= ~FILE_REFERENCE_FLAG
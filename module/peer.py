@@ -0,0 +1,62 @@
+# coding=UTF-8
+# Author:Gentlesprite
+# Software:PyCharm
+# File:peer.py
+import os
+import json
+import time
+from typing import Union
+
+from module import log
+from module.language import _t
+from module.enums import KeyWord
+
+
+class PeerCache:
+    """将链接中的频道(用户名或ID)映射为已解析的chat_id并持久化,过期后重新解析。"""
+
+    def __init__(self, path: str, ttl: int):
+        self.path: str = path
+        self.ttl: int = ttl
+        self.peers: dict = {}  # {频道: [chat_id, 过期时间戳]}
+        self.load()
+
+    @staticmethod
+    def key(chat: Union[int, str]) -> str:
+        return str(chat).lower()
+
+    def get(self, chat: Union[int, str]) -> Union[int, None]:
+        """返回未过期的chat_id,没有记录或已过期时返回None。"""
+        peer: Union[list, None] = self.peers.get(PeerCache.key(chat))
+        if peer is None:
+            return None
+        chat_id, expire = peer
+        if expire < time.time():
+            self.peers.pop(PeerCache.key(chat), None)
+            return None
+        return chat_id
+
+    def set(self, chat: Union[int, str], chat_id: int) -> None:
+        self.peers[PeerCache.key(chat)] = [chat_id, time.time() + self.ttl]
+        self.save()
+
+    def load(self) -> None:
+        if not os.path.isfile(self.path):
+            return None
+        try:
+            with open(file=self.path, mode='r', encoding='UTF-8') as f:
+                now: float = time.time()
+                self.peers = {k: v for k, v in json.load(f).items() if v[1] >= now}
+        except Exception as e:
+            self.peers = {}
+            log.warning(f'读取频道缓存"{self.path}"失败,将重新解析,{_t(KeyWord.REASON)}:"{e}"')
+
+    def save(self) -> None:
+        """将缓存写入磁盘。"""
+        _path: str = self.path + '.tmp'
+        try:
+            with open(file=_path, mode='w', encoding='UTF-8') as f:
+                json.dump(self.peers, f)
+            os.replace(_path, self.path)
+        except Exception as e:
+            log.warning(f'保存频道缓存"{self.path}"失败,{_t(KeyWord.REASON)}:"{e}"')
@@ -0,0 +1,106 @@
+# coding=UTF-8
+# Author:Gentlesprite
+# Software:PyCharm
+# File:pipeline.py
+import asyncio
+from typing import Callable, List
+
+from module import log
+from module.language import _t
+from module.enums import KeyWord
+
+
+class Stage:
+    """流水线中的一个阶段,拥有独立的(有界)队列与固定数量的工作协程。"""
+
+    def __init__(self, name: str, handler: Callable, worker_num: int, maxsize: int = 0):
+        self.name: str = name
+        self.handler: Callable = handler
+        self.worker_num: int = max(worker_num, 1)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.unfinished: int = 0  # 已放入但还没有处理完的任务数(包括等待重新放入的任务)。
+        self.__workers: list = []
+        self.__parked: set = set()  # 等待重新放入的定时任务。
+
+    async def put(self, item) -> None:
+        """放入任务,队列已满时等待,由此把背压传递给上一个阶段。"""
+        await self.queue.put(item)
+        self.unfinished += 1
+
+    def put_nowait(self, item) -> None:
+        self.queue.put_nowait(item)
+        self.unfinished += 1
+
+    def put_later(self, item, delay: float) -> None:
+        """在delay秒后放入任务,不占用工作协程,等待期间同样计入unfinished,流水线不会因此提前结束。"""
+        self.unfinished += 1
+        task: asyncio.Task = asyncio.create_task(self.__put_later(item, delay))
+        self.__parked.add(task)
+        task.add_done_callback(self.__unpark)
+
+    @property
+    def parked(self) -> int:
+        return len(self.__parked)
+
+    async def join(self) -> None:
+        """等待队列中的任务以及所有等待重新放入的任务处理完毕。"""
+        await self.queue.join()
+        while self.__parked:
+            await asyncio.wait(set(self.__parked))
+            await self.queue.join()
+
+    def start(self) -> None:
+        if not self.__workers:
+            self.__workers = [asyncio.create_task(self.__work()) for _ in range(self.worker_num)]
+
+    async def stop(self) -> None:
+        tasks: list = self.__workers + list(self.__parked)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.__workers = []
+
+    async def __put_later(self, item, delay: float) -> None:
+        await asyncio.sleep(delay)
+        await self.queue.put(item)
+
+    def __unpark(self, task: asyncio.Task) -> None:
+        self.__parked.discard(task)
+        if task.cancelled() or task.exception() is not None:
+            self.unfinished -= 1  # 任务没有被放入队列。
+
+    async def __work(self) -> None:
+        while True:
+            item = await self.queue.get()
+            try:
+                await self.handler(item)
+            except Exception as e:
+                log.exception(f'流水线阶段"{self.name}"处理任务时出错,{_t(KeyWord.REASON)}:"{e}"')
+            finally:
+                self.unfinished -= 1
+                self.queue.task_done()
+
+
+class Pipeline:
+    """按顺序串联的多个阶段,每个阶段只在把任务交给下一个阶段后才算处理完成。"""
+
+    def __init__(self, stages: List[Stage]):
+        self.stages: List[Stage] = stages
+
+    @property
+    def idle(self) -> bool:
+        return all(stage.unfinished == 0 for stage in self.stages)
+
+    def start(self) -> None:
+        for stage in self.stages:
+            stage.start()
+
+    async def stop(self) -> None:
+        for stage in self.stages:
+            await stage.stop()
+
+    async def join(self) -> None:
+        """等待所有阶段都处理完毕,处理过程中重新放回首个阶段的任务(如重试)也会被等待。"""
+        while not self.idle:
+            for stage in self.stages:
+                await stage.join()
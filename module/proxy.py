@@ -0,0 +1,158 @@
+# coding=UTF-8
+# Author:Gentlesprite
+# Software:PyCharm
+# File:proxy.py
+import time
+import socket
+import asyncio
+import ipaddress
+from typing import Iterable, List, Union
+
+import socks
+import pyrogram
+from pyrogram.session.internals import DataCenter
+from pyrogram.connection.transport.tcp.tcp import proxy_type_by_scheme
+
+from module import console, log
+from module.language import _t
+from module.enums import KeyWord
+
+
+class ProxyPool:
+    """代理池,定期经由每个代理连接Telegram数据中心以检测延迟,按延迟与负载为客户端分配代理。
+    客户端所用的代理不可用或明显慢于其他代理时,自动切换至最优的代理并重连该客户端的所有会话。
+    """
+    ALPHA: float = 0.3  # 延迟的指数加权平均系数。
+    DEGRADED_FACTOR: float = 3  # 延迟超过最优代理的多少倍时视为劣化并切换。
+
+    def __init__(self, proxies: Iterable[dict], interval: float, timeout: float):
+        self.proxies: List[dict] = []
+        for proxy in proxies:
+            proxy: dict = ProxyPool.normalize(proxy)
+            if proxy and proxy not in self.proxies:
+                self.proxies.append(proxy)
+        self.interval: float = interval
+        self.timeout: float = timeout
+        self.latency: List[Union[float, None]] = [None] * len(self.proxies)  # None代表不可用或尚未检测。
+        self.assigned: dict = {}  # {客户端: 代理的索引}
+        self.__task: Union[asyncio.Task, None] = None
+
+    @staticmethod
+    def normalize(proxy: dict) -> Union[dict, None]:
+        """只保留pyrogram需要的字段,缺少必要字段时返回None。"""
+        if not isinstance(proxy, dict) or not all([proxy.get('scheme'), proxy.get('hostname'), proxy.get('port')]):
+            return None
+        return {
+            'scheme': str(proxy.get('scheme')).lower(),
+            'hostname': str(proxy.get('hostname')),
+            'port': int(proxy.get('port')),
+            'username': proxy.get('username'),
+            'password': proxy.get('password')
+        }
+
+    @staticmethod
+    def format(proxy: dict) -> str:
+        return f'{proxy.get("scheme")}://{proxy.get("hostname")}:{proxy.get("port")}'
+
+    async def probe(self, proxy: dict) -> Union[float, None]:
+        """返回经由该代理与Telegram数据中心建立TCP连接所需的秒数,失败时返回None。"""
+
+        def _connect() -> float:
+            try:
+                is_ipv6: bool = isinstance(ipaddress.ip_address(proxy.get('hostname')), ipaddress.IPv6Address)
+            except ValueError:
+                is_ipv6: bool = False
+            sock = socks.socksocket(socket.AF_INET6 if is_ipv6 else socket.AF_INET)
+            sock.set_proxy(
+                proxy_type=proxy_type_by_scheme.get(proxy.get('scheme').upper()),
+                addr=proxy.get('hostname'),
+                port=proxy.get('port'),
+                username=proxy.get('username'),
+                password=proxy.get('password')
+            )
+            sock.settimeout(self.timeout)
+            start: float = time.monotonic()
+            try:
+                sock.connect(DataCenter(dc_id=2, test_mode=False, ipv6=False, media=False))
+                return time.monotonic() - start
+            finally:
+                sock.close()
+
+        try:
+            return await asyncio.to_thread(_connect)
+        except Exception as _:
+            return None
+
+    async def check(self) -> None:
+        """检测所有代理的延迟,并将使用不可用或劣化代理的客户端切换至其他代理。"""
+        results: list = await asyncio.gather(*[self.probe(proxy) for proxy in self.proxies])
+        for index, latency in enumerate(results):
+            if latency is None:
+                if self.latency[index] is not None:
+                    log.warning(f'代理"{ProxyPool.format(self.proxies[index])}"不可用。')
+                self.latency[index] = None
+            elif self.latency[index] is None:
+                self.latency[index] = latency
+            else:
+                self.latency[index] = self.ALPHA * latency + (1 - self.ALPHA) * self.latency[index]
+        healthy: list = [latency for latency in self.latency if latency is not None]
+        if not healthy:
+            log.error('代理池中的所有代理都不可用,请检查网络与代理配置。')
+            return None
+        best: float = min(healthy)
+        for client, index in list(self.assigned.items()):
+            latency: Union[float, None] = self.latency[index]
+            if latency is None or latency > best * self.DEGRADED_FACTOR:
+                await self.assign(client)
+
+    def select(self) -> Union[int, None]:
+        """按(已分配的客户端数+1)×延迟选出代价最小的可用代理,返回其索引。"""
+        load: dict = {}
+        for index in self.assigned.values():
+            load[index] = load.get(index, 0) + 1
+        candidates: list = [
+            index for index, latency in enumerate(self.latency) if latency is not None
+        ]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda index: (load.get(index, 0) + 1) * self.latency[index])
+
+    async def assign(self, client: pyrogram.Client) -> None:
+        """为客户端分配代理,客户端已连接时重连其所有会话使新代理生效。"""
+        current: Union[int, None] = self.assigned.pop(client, None)
+        index: Union[int, None] = self.select()
+        if index is None or index == current:
+            if current is not None:
+                self.assigned[client] = current
+            return None
+        self.assigned[client] = index
+        client.proxy = self.proxies[index]
+        if current is None or not client.is_connected:
+            return None
+        console.log(
+            f'"{client.name}"的代理已从"{ProxyPool.format(self.proxies[current])}"'
+            f'切换至"{ProxyPool.format(self.proxies[index])}"。'
+        )
+        for session in [client.session, *client.media_sessions.values()]:
+            try:
+                await session.restart()
+            except Exception as e:
+                log.warning(f'"{client.name}"切换代理后重连失败,{_t(KeyWord.REASON)}:"{e}"')
+
+    def start(self) -> None:
+        if self.__task is None:
+            self.__task = asyncio.create_task(self.__run())
+
+    async def stop(self) -> None:
+        if self.__task is not None:
+            self.__task.cancel()
+            await asyncio.gather(self.__task, return_exceptions=True)
+            self.__task = None
+
+    async def __run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.check()
+            except Exception as e:
+                log.warning(f'检测代理池时出错,{_t(KeyWord.REASON)}:"{e}"')
@@ -0,0 +1,96 @@
+# coding=UTF-8
+# Author:Gentlesprite
+# Software:PyCharm
+# File:resume.py
+import os
+import json
+from typing import Union
+
+from module import log
+from module.language import _t
+from module.enums import KeyWord
+from module.path_tool import safe_delete
+
+
+class ResumeRecord:
+    """记录临时文件中每个分段已校验的字节数,用于重试或重启后断点续传。"""
+    TEMP_EXT: str = '.temp'
+    EXT: str = '.resume'
+
+    def __init__(
+            self,
+            file_path: str,
+            file_unique_id: str,
+            file_size: int,
+            segments: list
+    ):
+        self.file_path: str = file_path
+        self.temp_file_path: str = file_path + ResumeRecord.TEMP_EXT
+        self.record_path: str = self.temp_file_path + ResumeRecord.EXT
+        self.file_unique_id: str = file_unique_id
+        self.file_size: int = file_size
+        self.segments: list = segments  # [[起始分块, 结束分块(不含), 已校验字节数], ...]
+
+    @property
+    def verified_size(self) -> int:
+        return sum(done for _, _, done in self.segments)
+
+    def update(self, index: int, done: int) -> None:
+        """更新某个分段已校验的字节数并立即落盘。"""
+        self.segments[index][2] = done
+        self.save()
+
+    def save(self) -> None:
+        """将续传记录写入磁盘,先写临时记录再替换。"""
+        _record_path: str = self.record_path + '.tmp'
+        with open(file=_record_path, mode='w', encoding='UTF-8') as f:
+            json.dump(
+                {
+                    'file_unique_id': self.file_unique_id,
+                    'file_size': self.file_size,
+                    'segments': self.segments
+                }, f
+            )
+        os.replace(_record_path, self.record_path)
+
+    def remove(self) -> None:
+        safe_delete(file_p_d=self.record_path)
+
+    @staticmethod
+    def load(file_path: str, file_unique_id: str, file_size: int) -> Union['ResumeRecord', None]:
+        """读取临时文件的续传记录,记录与当前文件不匹配时将其删除并返回None。"""
+        temp_file_path: str = file_path + ResumeRecord.TEMP_EXT
+        record_path: str = temp_file_path + ResumeRecord.EXT
+        if not os.path.isfile(record_path):
+            return None
+        try:
+            with open(file=record_path, mode='r', encoding='UTF-8') as f:
+                record: dict = json.load(f)
+            if all([
+                record.get('file_unique_id') == file_unique_id,
+                record.get('file_size') == file_size,
+                os.path.isfile(temp_file_path),
+                os.path.getsize(temp_file_path) == file_size
+            ]):
+                return ResumeRecord(
+                    file_path=file_path,
+                    file_unique_id=file_unique_id,
+                    file_size=file_size,
+                    segments=record.get('segments')
+                )
+        except Exception as e:
+            log.warning(f'读取续传记录"{record_path}"失败,将重新下载,{_t(KeyWord.REASON)}:"{e}"')
+        safe_delete(file_p_d=record_path)
+        return None
+
+    @staticmethod
+    def get_verified_size(file_path: str) -> Union[int, None]:
+        """获取临时文件已校验的字节数,没有续传记录时返回None。"""
+        record_path: str = file_path + ResumeRecord.TEMP_EXT + ResumeRecord.EXT
+        if not os.path.isfile(record_path):
+            return None
+        try:
+            with open(file=record_path, mode='r', encoding='UTF-8') as f:
+                return sum(done for _, _, done in json.load(f).get('segments'))
+        except Exception as _:
+            return None
@@ -0,0 +1,204 @@
+# coding=UTF-8
+# Author:Gentlesprite
+# Software:PyCharm
+# File:scheduler.py
+import asyncio
+from collections import deque
+from typing import Callable, Union
+
+from module import console
+
+
+class DcStats:
+    """单个数据中心的下载统计,速度与延迟均为指数加权平均值。"""
+    ALPHA: float = 0.3
+
+    def __init__(self):
+        self.throughput: float = 0  # 单个下载任务的平均速度(字节/秒)。
+        self.latency: float = 0  # 开始下载到收到首个分块的平均耗时(秒)。
+        self.count: int = 0
+        self.size: int = 0
+
+    def record(self, size: int, elapsed: float, latency: float) -> None:
+        throughput: float = size / elapsed if elapsed > 0 else 0
+        if self.count == 0:
+            self.throughput, self.latency = throughput, latency
+        else:
+            self.throughput = self.ALPHA * throughput + (1 - self.ALPHA) * self.throughput
+            self.latency = self.ALPHA * latency + (1 - self.ALPHA) * self.latency
+        self.count += 1
+        self.size += size
+
+
+class DownloadScheduler:
+    """有界的下载调度器,按先来先服务的顺序分配下载名额,并精确记录正在占用名额的任务数。
+    传入数据中心ID时按数据中心分组分配:优先分配给已有任务在下载的数据中心,同时下载的数据中心不超过max_hot_dc个;
+    多个数据中心同时排队时,较慢的数据中心按其速度获得较少的名额,达到上限的数据中心不再获得名额。
+    正在下载的数据中心仍有任务排队时,其他数据中心的任务继续等待,即使此时有空闲名额;
+    只有正在下载的数据中心都没有任务排队时,空闲名额才会分给新的数据中心。
+    """
+
+    def __init__(self, limit: int, max_hot_dc: int = 0):
+        self.limit: int = max(limit, 1)
+        self.active: int = 0
+        self.max_hot_dc: int = max_hot_dc  # 0代表不限制。
+        self.dc_active: dict = {}  # {数据中心ID: 正在占用名额的任务数}
+        self.dc_stats: dict = {}  # {数据中心ID: DcStats}
+        self.__waiters: deque = deque()  # [(future, 数据中心ID), ...]
+
+    @property
+    def pending(self) -> int:
+        """正在排队等待名额的任务数,已被取消但尚未移出队列的等待者不计入。"""
+        return sum(1 for future, _ in self.__waiters if not future.done())
+
+    async def acquire(self, dc_id: Union[int, None] = None) -> None:
+        """获取一个下载名额,名额已满时排队等待。"""
+        if self.active < self.limit and not self.__waiters and self.__is_eligible(dc_id):
+            self.__admit(dc_id)
+            return None
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        future: asyncio.Future = loop.create_future()
+        self.__waiters.append((future, dc_id))
+        if self.active < self.limit:
+            # 名额空闲但所在数据中心暂不优先,等同一时刻到达的其他任务排队后再统一分配。
+            loop.call_soon(self.__wakeup)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release(dc_id)  # 名额已经移交但等待者被取消,归还该名额。
+            else:  # 已被取消的等待者可能在唤醒时已被移出队列。
+                self.__waiters = deque(waiter for waiter in self.__waiters if waiter[0] is not future)
+            raise
+
+    def release(self, dc_id: Union[int, None] = None) -> None:
+        """归还一个下载名额,并直接移交给下一个等待者。"""
+        self.active = max(self.active - 1, 0)
+        if dc_id in self.dc_active:
+            self.dc_active[dc_id] -= 1
+            if self.dc_active.get(dc_id) <= 0:
+                self.dc_active.pop(dc_id)
+        self.__wakeup()
+
+    def set_limit(self, limit: int) -> None:
+        """调整名额上限,上调时立即唤醒相应数量的等待者。"""
+        self.limit = max(limit, 1)
+        self.__wakeup()
+
+    def record(self, dc_id: Union[int, None], size: int, elapsed: float, latency: float) -> None:
+        """记录一次下载的传输字节数、耗时与首个分块的延迟。"""
+        if dc_id is not None and size > 0:
+            self.dc_stats.setdefault(dc_id, DcStats()).record(size=size, elapsed=elapsed, latency=latency)
+
+    def get_dc_limit(self, dc_id: Union[int, None]) -> int:
+        """按该数据中心与正在下载或排队的最快数据中心的速度之比分配名额上限。"""
+        stats: Union[DcStats, None] = self.dc_stats.get(dc_id)
+        if dc_id is None or stats is None or not stats.throughput:
+            return self.limit
+        dcs: set = set(self.dc_active) | {_dc_id for _, _dc_id in self.__waiters}
+        fastest: float = max(
+            [self.dc_stats.get(_dc_id).throughput for _dc_id in dcs if _dc_id in self.dc_stats] + [stats.throughput]
+        )
+        return max(1, round(self.limit * stats.throughput / fastest))
+
+    def __admit(self, dc_id: Union[int, None]) -> None:
+        self.active += 1
+        if dc_id is not None:
+            self.dc_active[dc_id] = self.dc_active.get(dc_id, 0) + 1
+
+    def __is_under_limit(self, dc_id: Union[int, None]) -> bool:
+        return dc_id is None or self.dc_active.get(dc_id, 0) < self.get_dc_limit(dc_id)
+
+    def __is_hot(self, dc_id: Union[int, None]) -> bool:
+        """该数据中心已有任务在下载,或同时下载的数据中心数还没有达到上限。"""
+        return dc_id is None or dc_id in self.dc_active or not self.max_hot_dc or len(self.dc_active) < self.max_hot_dc
+
+    def __is_eligible(self, dc_id: Union[int, None]) -> bool:
+        return self.__is_hot(dc_id) and self.__is_under_limit(dc_id)
+
+    def __select(self) -> Union[int, None]:
+        """选出下一个获得名额的等待者的位置,暂时没有可以获得名额的等待者时返回None。"""
+        candidates: list = []  # 所在数据中心不在下载中且未超过名额上限的等待者。
+        is_hot_queued: bool = False  # 正在下载的数据中心是否仍有任务排队。
+        for index, (_, dc_id) in enumerate(self.__waiters):
+            if self.__is_eligible(dc_id):
+                return index
+            if dc_id in self.dc_active:
+                is_hot_queued = True  # 该数据中心已达到名额上限,跳过其任务,继续寻找可以开始的任务。
+            elif self.__is_under_limit(dc_id):
+                candidates.append(index)
+        return candidates[0] if candidates and not is_hot_queued else None
+
+    def __wakeup(self) -> None:
+        # 名额在唤醒时就记入active,被唤醒的任务无需再次竞争,避免同时唤醒多个等待者导致超发。
+        self.__waiters = deque(waiter for waiter in self.__waiters if not waiter[0].done())
+        while self.__waiters and self.active < self.limit:
+            index: Union[int, None] = self.__select()
+            if index is None:
+                # 没有任务在下载时所有等待者都满足条件,因此这里总有任务在下载,其归还名额时会再次唤醒。
+                break
+            future, dc_id = self.__waiters[index]
+            del self.__waiters[index]
+            self.__admit(dc_id)
+            future.set_result(None)
+
+
+class AdaptiveController:
+    """按加性增、乘性减(AIMD)的方式在[min_limit, max_limit]之间动态调整调度器的名额上限。
+    期间出现限流或超时时名额减半,名额用满且仍有任务排队、吞吐量没有下降时名额加一。
+    """
+
+    def __init__(
+            self,
+            scheduler: DownloadScheduler,
+            get_transferred_size: Callable[[], int],
+            min_limit: int,
+            max_limit: int,
+            interval: float
+    ):
+        self.scheduler: DownloadScheduler = scheduler
+        self.get_transferred_size: Callable[[], int] = get_transferred_size
+        self.min_limit: int = max(min_limit, 1)
+        self.max_limit: int = max(max_limit, self.min_limit)
+        self.interval: float = interval
+        self.throughput: float = 0  # 上一个周期的吞吐量(字节/秒)。
+        self.__congestion: int = 0
+        self.__last_size: int = 0
+        self.__task: Union[asyncio.Task, None] = None
+
+    def record_congestion(self) -> None:
+        """记录一次限流(FloodWait)或超时。"""
+        self.__congestion += 1
+
+    def start(self) -> None:
+        if self.__task is None:
+            self.__last_size = self.get_transferred_size()
+            self.__task = asyncio.create_task(self.__run())
+
+    async def stop(self) -> None:
+        if self.__task is not None:
+            self.__task.cancel()
+            await asyncio.gather(self.__task, return_exceptions=True)
+            self.__task = None
+
+    def adjust(self, throughput: float) -> int:
+        """根据本周期的吞吐量与拥塞情况计算新的名额上限。"""
+        limit: int = self.scheduler.limit
+        if self.__congestion:
+            limit = max(self.min_limit, limit // 2)
+            if limit != self.scheduler.limit:
+                console.log(f'检测到{self.__congestion}次限流或超时,同时下载任务数已调整为{limit}。', style='#FF4689')
+        elif self.scheduler.pending and self.scheduler.active >= self.scheduler.limit:
+            limit = min(self.max_limit, limit + 1) if throughput >= self.throughput * 0.9 else \
+                max(self.min_limit, limit - 1)
+        self.__congestion = 0
+        self.throughput = throughput
+        self.scheduler.set_limit(limit) if limit != self.scheduler.limit else None
+        return limit
+
+    async def __run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            size: int = self.get_transferred_size()
+            self.adjust(throughput=(size - self.__last_size) / self.interval)
+            self.__last_size = size
@@ -104,6 +104,25 @@ class StatisticalTable:
             )
             media_table.print_meta()
 
+    @staticmethod
+    def print_dc_table(dc_stats: dict) -> None:
+        """打印各数据中心的下载速度与延迟的表格。"""
+        data: list = [
+            [
+                f'DC{dc_id}',
+                stats.count,
+                MetaData.suitable_units_display(stats.size),
+                f'{MetaData.suitable_units_display(int(stats.throughput))}/s',
+                f'{stats.latency * 1000:.0f}ms'
+            ] for dc_id, stats in sorted(dc_stats.items())
+        ]
+        if data:
+            PanelTable(
+                title='数据中心统计',
+                header=('数据中心', '下载次数', '下载大小', '平均速度', '平均延迟'),
+                data=data
+            ).print_meta()
+
     @staticmethod
     def print_link_table(link_info: dict) -> Union[bool, str]:
         """打印统计的下载链接信息的表格。"""
@@ -15,6 +15,7 @@ from module.enums import DownloadStatus, KeyWord
 class Task:
     LINK_INFO: dict = {}
     COMPLETE_LINK: set = set()
+    LINK_WAITER: dict = {}  # {负责下载的链接: {等待其完成的链接, ...}}。
 
     def __init__(
             self,
@@ -40,6 +41,15 @@ class Task:
             Task(link=link, link_type=None, member_num=0, complete_num=0, file_name=set(), error_msg={})
             res: dict = await func(self, *args, **kwargs)
             chat_id, link_type, member_num, status, e_code = res.values()
+            if status != DownloadStatus.DOWNLOADING:
+                # 下载中的链接在加入下载队列前已写入,此时其文件可能都已存在并已将链接记为完成,不能再覆盖。
+                self.ledger.add_link(
+                    link=link,
+                    chat_id=chat_id,
+                    link_type=link_type,
+                    member_num=member_num,
+                    status=status
+                )
             if status == DownloadStatus.FAILURE:
                 Task.LINK_INFO.get(link)['error_msg'] = e_code
                 reason: str = e_code.get('error_msg')
@@ -62,8 +72,8 @@ class Task:
 
     def on_complete(func):
         @wraps(func)
-        def wrapper(self, *args, **kwargs):
-            res = func(self, *args, **kwargs)
+        async def wrapper(self, *args, **kwargs):
+            res = await func(self, *args, **kwargs)
             if all(i is None for i in res):
                 return None
             link, file_name = res
@@ -76,13 +86,20 @@ class Task:
             all_num: int = Task.LINK_INFO.get(link).get('member_num')
             complete_num: int = Task.LINK_INFO.get(link).get('complete_num')
             if all_num == complete_num:
-                console.log(
-                    f'{_t(KeyWord.LINK)}:"{link}",'
-                    f'{_t(KeyWord.STATUS)}:{_t(DownloadStatus.SUCCESS)}。'
-                )
-                Task.LINK_INFO.get(link)['error_msg'] = {}
-                Task.COMPLETE_LINK.add(link)
-                asyncio.create_task(self.done_notice(link))
+                for _link in (link, *Task.LINK_WAITER.pop(link, set())):
+                    # 指向同一媒体组的其他链接随负责下载的链接一同完成。
+                    info: dict = Task.LINK_INFO.get(_link)
+                    info['member_num'] = all_num
+                    info['complete_num'] = complete_num
+                    info['file_name'] = set(Task.LINK_INFO.get(link).get('file_name'))
+                    console.log(
+                        f'{_t(KeyWord.LINK)}:"{_link}",'
+                        f'{_t(KeyWord.STATUS)}:{_t(DownloadStatus.SUCCESS)}。'
+                    )
+                    info['error_msg'] = {}
+                    Task.COMPLETE_LINK.add(_link)
+                    self.ledger.set_link_status(link=_link, status=DownloadStatus.SUCCESS)
+                    asyncio.create_task(self.done_notice(_link))
             return res
 
         return wrapper
@@ -0,0 +1,53 @@
+# coding=UTF-8
+# Author:Gentlesprite
+# Software:PyCharm
+# File:test_scheduler.py
+import asyncio
+
+from module.scheduler import DownloadScheduler
+
+
+async def _fill(scheduler: DownloadScheduler, dc_ids: list) -> list:
+    tasks: list = [asyncio.create_task(scheduler.acquire(dc_id)) for dc_id in dc_ids]
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    return tasks
+
+
+def test_capped_dc_does_not_block_other_dcs():
+    """排在队首的慢数据中心达到名额上限时,快数据中心的任务仍能用满所有名额。"""
+
+    async def _run() -> None:
+        scheduler = DownloadScheduler(limit=8, max_hot_dc=2)
+        scheduler.record(dc_id=1, size=100, elapsed=1, latency=0)
+        scheduler.record(dc_id=2, size=10, elapsed=1, latency=0)
+        await scheduler.acquire(1)
+        await scheduler.acquire(2)  # 数据中心2的名额上限为round(8×10/100)=1。
+        tasks: list = await _fill(scheduler, [2] + [1] * 10)
+        assert scheduler.active == scheduler.limit
+        assert scheduler.dc_active.get(2) == 1
+        assert scheduler.dc_active.get(1) == 7
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    asyncio.run(_run())
+
+
+def test_mixed_dcs_fill_all_slots():
+    """多个数据中心的任务交错排队时,名额始终被用满且不超过max_hot_dc个数据中心。"""
+
+    async def _run() -> None:
+        scheduler = DownloadScheduler(limit=6, max_hot_dc=2)
+        tasks: list = await _fill(scheduler, [1, 2, 3, 1, 2, 3, 1, 2, 3, 1, 2, 3])
+        assert scheduler.active == scheduler.limit
+        assert set(scheduler.dc_active) == {1, 2}
+        scheduler.release(1)
+        await asyncio.sleep(0)
+        assert scheduler.active == scheduler.limit
+        assert set(scheduler.dc_active) == {1, 2}
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    asyncio.run(_run())